@@ -0,0 +1,136 @@
+import atexit
+import queue
+import logging
+import threading
+import time
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from accounts import rollups
+from accounts.models import UserActivity
+
+# Activity rows are not written by the request that produced them. They are
+# put on a bounded in-process queue and a background thread writes them with
+# bulk_create, once ACTIVITY_BATCH_SIZE rows are waiting or the oldest has
+# waited ACTIVITY_FLUSH_INTERVAL seconds, and counts them into the traffic
+# rollups (accounts/rollups.py) in the same transaction. A page view never
+# waits on the database write lock. When the queue is full new rows are
+# dropped and counted rather than slowing requests down; at interpreter exit
+# the queue is drained.
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ActivityWriter:
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._reported_dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+        # Once per writer, however often the thread is (re)started.
+        atexit.register(self.stop)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            # Also restarts the thread in a forked worker, which does not inherit it.
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="activity-writer", daemon=True)
+                self._thread.start()
+
+    def record(self, activity):
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(activity)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been written."""
+        self._ensure_started()
+        done = threading.Event()
+        self.queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def stop(self, timeout=5):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = max(0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if isinstance(item, UserActivity):
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+            if batch:
+                self._write(batch)
+                batch = []
+            if item is _STOP:
+                close_old_connections()
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+
+    def _write(self, batch):
+        close_old_connections()
+        try:
+            with transaction.atomic(using=router.db_for_write(UserActivity)):
+                UserActivity.objects.bulk_create(batch)
+                rollups.add(batch)
+            self.written += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Could not write %d activity rows.", len(batch))
+
+        if self.dropped != self._reported_dropped:
+            logger.warning("Activity queue full: %d rows dropped so far.", self.dropped)
+            self._reported_dropped = self.dropped
+
+    def stats(self):
+        return {
+            "queued": self.queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+_writer = None
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        _writer = ActivityWriter(
+            max_size=settings.ACTIVITY_QUEUE_SIZE,
+            batch_size=settings.ACTIVITY_BATCH_SIZE,
+            flush_interval=settings.ACTIVITY_FLUSH_INTERVAL,
+        )
+    return _writer
+
+
+def record(activity):
+    get_writer().record(activity)
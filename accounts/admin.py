@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django import forms
 from django.utils.html import format_html
-from .models import Profile, Cart, CartItem, Order, OrderItem
+from .models import Profile, Cart, CartItem, Order, OrderItem, StockReservation
 
 # Register your models here.
 
@@ -44,3 +44,4 @@ admin.site.register(Cart)
 admin.site.register(CartItem)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(StockReservation)
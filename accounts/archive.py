@@ -0,0 +1,83 @@
+import os
+import gzip
+import json
+from collections import defaultdict
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db import router, transaction
+from accounts.models import UserActivity
+
+# Old activity is moved out of the hot table into one gzipped JSONL file per
+# UTC day, ACTIVITY_ARCHIVE_DIR/YYYY/MM/activity-YYYY-MM-DD.jsonl.gz. Each
+# chunk is appended as its own gzip member and synced to disk before its rows
+# are deleted, in the same transaction, so a failed run loses nothing (at
+# worst a chunk is archived twice). read_archive() streams rows back line by
+# line, one partition at a time.
+FIELDS = ('id', 'user_id', 'timestamp', 'ip', 'action', 'page_url', 'raw_input', 'threat_score')
+
+
+def partition_path(day, directory=None):
+    directory = directory or settings.ACTIVITY_ARCHIVE_DIR
+    return os.path.join(directory, f"{day:%Y}", f"{day:%m}", f"activity-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def _append(path, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lines = "".join(json.dumps(row) + "\n" for row in rows)
+    with open(path, 'ab') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='ab') as archive:
+            archive.write(lines.encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_before(cutoff, chunk_size=5000, directory=None):
+    """Move activity older than ``cutoff`` to the archive, ``chunk_size`` rows
+    per transaction; returns how many rows were archived."""
+    database = router.db_for_write(UserActivity)
+    archived = 0
+    while True:
+        with transaction.atomic(using=database):
+            rows = list(
+                UserActivity.objects.filter(timestamp__lt=cutoff)
+                .order_by('timestamp', 'id')
+                .values(*FIELDS)[:chunk_size]
+            )
+            if not rows:
+                return archived
+
+            days = defaultdict(list)
+            for row in rows:
+                day = row['timestamp'].astimezone(dt_timezone.utc).date()
+                days[day].append(dict(row, timestamp=row['timestamp'].isoformat()))
+            for day, day_rows in days.items():
+                _append(partition_path(day, directory), day_rows)
+
+            UserActivity.objects.filter(id__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min, tzinfo=dt_timezone.utc)
+
+
+def read_archive(start, end, directory=None, **filters):
+    """Yield archived rows as dicts with ``start <= timestamp < end`` (dates or
+    aware datetimes), optionally matching ``filters`` exactly, e.g.
+    ``action="Search Query"`` or ``user_id=3``."""
+    start, end = _as_datetime(start), _as_datetime(end)
+    day = start.astimezone(dt_timezone.utc).date()
+    last = end.astimezone(dt_timezone.utc).date()
+    while day <= last:
+        path = partition_path(day, directory)
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                for line in archive:
+                    row = json.loads(line)
+                    row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+                    if start <= row['timestamp'] < end and \
+                            all(row.get(field) == value for field, value in filters.items()):
+                        yield row
+        day += timedelta(days=1)
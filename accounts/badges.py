@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db import transaction
+from accounts.models import Profile, CartItem
+from products.models import Wishlist
+
+# Per-user values shown in the navbar on every page (cart and wishlist badge
+# counts and the profile image), kept in the shared cache so rendering the
+# navbar runs no queries. accounts.signals drops a user's value after every
+# commit that adds or removes a cart line, pays a cart, changes the wishlist
+# or saves the profile, and the next page view reloads it. Values are
+# dropped rather than rewritten because two commits' rewrites can land out of
+# order; the short timeout bounds how long a write made outside the ORM, or a
+# reload that raced a commit, can leave a badge wrong.
+BADGE_TIMEOUT = 60 * 10
+
+
+def _key(name, user_id):
+    return f"badge:{name}:{user_id}"
+
+
+def _count_cart(user_id):
+    return CartItem.objects.filter(cart__is_paid=False, cart__user_id=user_id).count()
+
+
+def _count_wishlist(user_id):
+    return Wishlist.objects.filter(user_id=user_id).count()
+
+
+def _profile_image(user_id):
+    # Cached as '' rather than None so a missing image is still a cache hit.
+    return Profile.objects.filter(user_id=user_id).values_list('profile_image', flat=True).first() or ''
+
+
+LOADERS = {
+    'cart': _count_cart,
+    'wishlist': _count_wishlist,
+    'profile_image': _profile_image,
+}
+
+
+def get_value(name, user_id):
+    if user_id is None:
+        return None
+    value = cache.get(_key(name, user_id))
+    if value is None:
+        value = refresh(name, user_id)
+    return value
+
+
+def refresh(name, user_id):
+    value = LOADERS[name](user_id)
+    cache.set(_key(name, user_id), value, BADGE_TIMEOUT)
+    return value
+
+
+def schedule_invalidate(name, user_id):
+    """Drop a user's value once the current transaction commits."""
+    if user_id is not None:
+        transaction.on_commit(lambda: cache.delete(_key(name, user_id)))
+
+
+def cart_count(user_id):
+    return get_value('cart', user_id) or 0
+
+
+def wishlist_count(user_id):
+    return get_value('wishlist', user_id) or 0
+
+
+def profile_image(user_id):
+    return get_value('profile_image', user_id) or ''
@@ -0,0 +1,72 @@
+import uuid
+from django.db import transaction
+from accounts import badges, inventory
+from accounts.models import Cart, Order, OrderItem
+
+# Turns an open cart into an Order. The whole checkout is a fixed handful of
+# statements whatever the cart size: a conditional UPDATE that claims the cart
+# (so a double-submitted checkout cannot create two orders), one SELECT for
+# the lines with their totals, the stock settlement (accounts.inventory), one
+# INSERT for the order and one bulk INSERT for its items.
+PAYMENT_MODE = 'Cash on Delivery'
+PAYMENT_STATUS = 'Pending'
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def _order_id():
+    return f"ORD-{uuid.uuid4().hex[:12].upper()}"
+
+
+def checkout(cart, payment_mode=PAYMENT_MODE, payment_status=PAYMENT_STATUS):
+    """Create an Order for ``cart`` and mark the cart paid. Each OrderItem keeps
+    the price charged for its line in ``product_price``, so later price
+    changes never alter past orders."""
+    with transaction.atomic():
+        if not Cart.objects.filter(uid=cart.uid, is_paid=False).update(is_paid=True):
+            raise CheckoutError("This cart has already been checked out.")
+
+        cart.refresh_totals()
+        lines = cart.get_cart_lines()
+        if not lines:
+            raise CheckoutError("Your cart is empty.")
+
+        try:
+            inventory.settle(cart, lines)
+        except inventory.OutOfStock as e:
+            raise CheckoutError(str(e))
+
+        order_total = sum(line.line_total for line in lines)
+        coupon = cart.coupon
+        if coupon and (coupon.is_expired or order_total < coupon.minimum_amount):
+            coupon = None
+        grand_total = order_total - coupon.discount_amount if coupon else order_total
+
+        shipping_address = cart.user.profile.shipping_address
+        order = Order.objects.create(
+            user=cart.user,
+            order_id=_order_id(),
+            payment_status=payment_status,
+            payment_mode=payment_mode,
+            shipping_address=str(shipping_address) if shipping_address else None,
+            order_total_price=order_total,
+            coupon=coupon,
+            grand_total=grand_total,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line.product,
+                size_variant=line.size_variant,
+                color_variant=line.color_variant,
+                quantity=line.quantity,
+                product_price=line.line_total,
+            )
+            for line in lines
+        ])
+
+    cart.is_paid = True
+    badges.schedule_invalidate('cart', cart.user_id)
+    return order
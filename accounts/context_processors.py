@@ -0,0 +1,12 @@
+from accounts import badges
+
+
+def navbar_badges(request):
+    """Cart and wishlist badge counts and the profile image for the navbar,
+    read from the cache only when a template renders them."""
+    user_id = request.user.id if request.user.is_authenticated else None
+    return {
+        'cart_count': lambda: badges.cart_count(user_id),
+        'wishlist_count': lambda: badges.wishlist_count(user_id),
+        'navbar_profile_image': lambda: badges.profile_image(user_id),
+    }
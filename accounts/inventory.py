@@ -0,0 +1,160 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import transaction, IntegrityError
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from accounts.models import StockReservation
+from products.models import ProductStock
+
+# Stock is only ever changed by conditional UPDATEs on single ProductStock
+# rows (stock = stock - n WHERE stock >= n), so buyers of different items
+# never wait on each other and a row can never go below zero. Adding an item
+# to the cart takes the units straight away and records them in a short-lived
+# StockReservation; removing or lowering a line releases the units it no
+# longer needs, checkout settles the cart against its reservations, taking or
+# returning only the difference, and release_expired() (run by the
+# release_expired_reservations command) hands expired holds back.
+RESERVATION_TTL = timedelta(minutes=15)
+
+
+class OutOfStock(Exception):
+    pass
+
+
+def find_stock(product, size_variant):
+    if size_variant is None:
+        return None
+    return ProductStock.objects.filter(product=product, size_variant=size_variant).first()
+
+
+def reserve(cart, product, size_variant, quantity=1):
+    """Hold ``quantity`` more units for the cart, refreshing the hold's expiry.
+    Raises OutOfStock when too few units are left; untracked items are
+    always available."""
+    stock = find_stock(product, size_variant)
+    if stock is None:
+        return
+
+    expires_at = timezone.now() + RESERVATION_TTL
+    with transaction.atomic():
+        if not ProductStock.objects.filter(uid=stock.uid, stock__gte=quantity).update(
+                stock=F('stock') - quantity):
+            raise OutOfStock(f"Sorry, {product.product_name} is out of stock in that size.")
+
+        holds = StockReservation.objects.filter(cart=cart, stock=stock)
+        if holds.update(quantity=F('quantity') + quantity, expires_at=expires_at):
+            return
+        try:
+            with transaction.atomic():
+                StockReservation.objects.create(
+                    cart=cart, stock=stock, quantity=quantity, expires_at=expires_at)
+        except IntegrityError:
+            holds.update(quantity=F('quantity') + quantity, expires_at=expires_at)
+
+
+def release(cart, product, size_variant, quantity):
+    """Hand back up to ``quantity`` of the units the cart holds, when a line is
+    removed or lowered, so they can be sold again before the hold expires."""
+    stock = find_stock(product, size_variant)
+    if stock is None or quantity < 1:
+        return
+
+    with transaction.atomic():
+        hold = StockReservation.objects.select_for_update().filter(cart=cart, stock=stock).first()
+        if hold is None or hold.quantity < 1:
+            return
+        units = min(quantity, hold.quantity)
+        holds = StockReservation.objects.filter(uid=hold.uid, quantity=hold.quantity)
+        if units == hold.quantity:
+            changed, _ = holds.delete()
+        else:
+            changed = holds.update(quantity=F('quantity') - units)
+        if changed:
+            # Otherwise a checkout or the sweeper got to the hold first.
+            _give_back({stock.uid: units})
+
+
+def _amounts(amounts):
+    return Case(
+        *[When(uid=uid, then=Value(amount)) for uid, amount in amounts.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _take(amounts):
+    """Take ``{stock_uid: units}`` in one UPDATE; True only if every row had enough."""
+    amount = _amounts(amounts)
+    taken = ProductStock.objects.filter(uid__in=list(amounts), stock__gte=amount).update(
+        stock=F('stock') - amount)
+    return taken == len(amounts)
+
+
+def _give_back(amounts):
+    amount = _amounts(amounts)
+    ProductStock.objects.filter(uid__in=list(amounts)).update(stock=F('stock') + amount)
+
+
+def settle(cart, lines):
+    """Turn the cart's holds into sales of ``lines``. Must run inside the
+    checkout transaction: it raises OutOfStock, leaving the caller to roll
+    back, when a line's units can no longer be taken."""
+    holds = list(StockReservation.objects.select_for_update().filter(cart=cart))
+    tracked = [line for line in lines if line.size_variant_id]
+    if not holds and not tracked:
+        return
+
+    rows = ProductStock.objects.filter(
+        product_id__in={line.product_id for line in tracked},
+        size_variant_id__in={line.size_variant_id for line in tracked},
+    ).values_list('uid', 'product_id', 'size_variant_id')
+    stock_ids = {(product_id, size_id): uid for uid, product_id, size_id in rows}
+
+    needed = defaultdict(int)
+    for line in tracked:
+        stock_id = stock_ids.get((line.product_id, line.size_variant_id))
+        if stock_id:
+            needed[stock_id] += line.quantity
+    for hold in holds:
+        needed[hold.stock_id] -= hold.quantity
+
+    if holds:
+        deleted, _ = StockReservation.objects.filter(uid__in=[hold.uid for hold in holds]).delete()
+        if deleted != len(holds):
+            # The sweeper released some of them first.
+            raise OutOfStock("Your cart changed while checking out, please try again.")
+
+    take = {stock_id: units for stock_id, units in needed.items() if units > 0}
+    if take and not _take(take):
+        raise OutOfStock("Some items in your cart are no longer in stock.")
+
+    surplus = {stock_id: -units for stock_id, units in needed.items() if units < 0}
+    if surplus:
+        _give_back(surplus)
+
+
+def release_expired(batch_size=500):
+    """Return the units of expired holds to stock; returns how many holds were released."""
+    released = 0
+    while True:
+        with transaction.atomic():
+            holds = list(
+                StockReservation.objects.select_for_update(skip_locked=True)
+                .filter(expires_at__lte=timezone.now())
+                .order_by('expires_at')[:batch_size]
+            )
+            if not holds:
+                return released
+
+            deleted, _ = StockReservation.objects.filter(uid__in=[hold.uid for hold in holds]).delete()
+            if deleted != len(holds):
+                # A checkout settled some of this batch meanwhile; read it again.
+                transaction.set_rollback(True)
+                continue
+
+            units = defaultdict(int)
+            for hold in holds:
+                if hold.quantity:
+                    units[hold.stock_id] += hold.quantity
+            if units:
+                _give_back(units)
+            released += len(holds)
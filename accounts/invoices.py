@@ -0,0 +1,93 @@
+import os
+import glob
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.template.loader import render_to_string
+from accounts import pdf_worker
+
+# Invoice PDFs are rendered by WeasyPrint in a small pool of worker processes
+# (the work is CPU-bound) and kept on disk under INVOICE_CACHE_DIR, named by
+# order id plus a digest of the rendered invoice HTML. Any change to what the
+# invoice shows gives a new file name, so a cached file is never stale; the
+# job that writes the new file removes the order's older ones. Requests only
+# render the HTML, which is cheap, and either find the file or report that it
+# is still rendering.
+INVOICE_TEMPLATE = 'accounts/order_pdf_generate.html'
+
+READY = 'ready'
+RENDERING = 'rendering'
+FAILED = 'failed'
+
+_executor = None
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Spawned rather than forked: the web process may be running threads.
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.INVOICE_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def _reset_executor():
+    global _executor
+    _executor = None
+
+
+def _submit(*args):
+    try:
+        return _get_executor().submit(pdf_worker.write_pdf, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool once.
+        _reset_executor()
+        return _get_executor().submit(pdf_worker.write_pdf, *args)
+
+
+def render_html(order):
+    return render_to_string(INVOICE_TEMPLATE, {
+        'order': order,
+        'order_items': order.get_order_items(),
+    })
+
+
+def invoice_path(order, html):
+    digest = hashlib.sha256(html.encode()).hexdigest()[:16]
+    return os.path.join(settings.INVOICE_CACHE_DIR, f"{order.order_id}-{digest}.pdf")
+
+
+def get_invoice(order):
+    """Return ``(status, path)`` for the order's invoice: READY with the PDF's
+    path, or RENDERING after making sure a job is queued. A failed job is
+    reported once as FAILED and retried on the next call."""
+    html = render_html(order)
+    path = invoice_path(order, html)
+    if os.path.exists(path):
+        return READY, path
+
+    with _lock:
+        job = _jobs.get(path)
+        if job is not None and job.done():
+            del _jobs[path]
+            if job.exception() is not None:
+                if isinstance(job.exception(), BrokenProcessPool):
+                    _reset_executor()
+                return FAILED, None
+            if os.path.exists(path):
+                return READY, path
+            job = None
+
+        if job is None:
+            pattern = os.path.join(glob.escape(str(settings.INVOICE_CACHE_DIR)), f"{glob.escape(order.order_id)}-*.pdf")
+            stale_paths = [other for other in glob.glob(pattern) if other != path]
+            _jobs[path] = _submit(html, path, stale_paths)
+
+    return RENDERING, None
@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts import archive, rollups
+from accounts.models import ActivityRollup
+
+
+class Command(BaseCommand):
+    help = ("Move activity older than the retention period into gzipped daily JSONL files "
+            "and delete it from the database, and prune old per-minute rollups. Run daily from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_RETENTION_DAYS,
+                            help="Keep this many days of activity in the database.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--dir', default=None, help="Archive directory (default ACTIVITY_ARCHIVE_DIR).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        archived = archive.archive_before(cutoff, chunk_size=options['chunk_size'], directory=options['dir'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} activity rows older than {cutoff:%Y-%m-%d %H:%M}."))
+
+        # Day rollups are small and kept; minute rollups only matter for recent traffic.
+        pruned = rollups.prune(
+            ActivityRollup.MINUTE, timezone.now() - timedelta(days=settings.ACTIVITY_MINUTE_ROLLUP_DAYS))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} per-minute rollups."))
@@ -0,0 +1,80 @@
+import time
+import uuid
+import threading
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, OperationalError
+from accounts.models import Cart, CartItem, add_cart_item
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = ("Add the same product to one cart from many threads against the configured "
+            "database, then check that no increment was lost and report throughput.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--adds', type=int, default=50, help="Adds per thread.")
+        parser.add_argument('--naive', action='store_true',
+                            help="Use the old get_or_create plus quantity += 1 path for comparison.")
+
+    def handle(self, *args, **options):
+        product = Product.objects.exclude(size_variant=None).first()
+        if product is None:
+            raise CommandError("Needs at least one product with a size variant.")
+        size_variant = product.size_variant.first()
+        user = User.objects.create(username=f"cart-concurrency-{uuid.uuid4().hex[:12]}")
+
+        added = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def worker():
+            done = failed = 0
+            start.wait()
+            try:
+                for _ in range(options['adds']):
+                    try:
+                        cart, _ = Cart.objects.get_or_create(user=user, is_paid=False)
+                        if options['naive']:
+                            item, created = CartItem.objects.get_or_create(
+                                cart=cart, product=product, size_variant=size_variant)
+                            if not created:
+                                item.quantity += 1
+                                item.save()
+                        else:
+                            add_cart_item(cart, product, size_variant)
+                        done += 1
+                    except OperationalError:
+                        # SQLite gives up with "database is locked" under heavy write contention.
+                        failed += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    added.append(done)
+                    errors.append(failed)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        try:
+            quantity = CartItem.objects.filter(cart__user=user).values_list('quantity', flat=True)
+            expected = sum(added)
+            actual = sum(quantity)
+            lines = len(quantity)
+        finally:
+            user.delete()
+
+        self.stdout.write(
+            f"{options['threads']} threads, {expected} adds in {elapsed:.2f}s "
+            f"({expected / elapsed:.0f}/s), {sum(errors)} failed with database errors.")
+        self.stdout.write(f"Cart quantity {actual} across {lines} line(s); expected {expected}.")
+        if actual != expected or lines != 1:
+            raise CommandError(f"Lost {expected - actual} increments.")
+        self.stdout.write(self.style.SUCCESS("No lost updates."))
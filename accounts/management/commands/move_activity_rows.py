@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from accounts import rollups
+from accounts.models import UserActivity
+
+
+class Command(BaseCommand):
+    help = ("Move the activity rows written before UserActivity was routed to its own database "
+            "out of the main database's accounts_useractivity table and into the routed one, "
+            "counting them into the rollups. Run once after deploying the route; safe to rerun.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--from-database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        source = options['from_database']
+        target = router.db_for_write(UserActivity)
+        table = UserActivity._meta.db_table
+        if source == target:
+            self.stdout.write(f"UserActivity is not routed away from '{source}'; nothing to move.")
+            return
+        if table not in connections[source].introspection.table_names():
+            self.stdout.write(f"'{source}' has no {table} table; nothing to move.")
+            return
+
+        # Each chunk is committed to the target before it is deleted from the
+        # source, so an interrupted run loses nothing; at worst a rerun copies
+        # one chunk twice. Rows get new ids, as the target has its own sequence.
+        moved = 0
+        while True:
+            rows = list(UserActivity.objects.using(source).order_by('id')[:options['chunk_size']])
+            if not rows:
+                break
+            ids = [row.id for row in rows]
+            for row in rows:
+                row.id = None
+            with transaction.atomic(using=target):
+                UserActivity.objects.using(target).bulk_create(rows)
+                rollups.add(rows)
+            UserActivity.objects.using(source).filter(id__in=ids).delete()
+            moved += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} activity rows from '{source}' to '{target}'. "
+            f"The empty {table} table in '{source}' is no longer used and can be dropped."))
@@ -0,0 +1,22 @@
+import json
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from accounts import archive
+
+
+class Command(BaseCommand):
+    help = "Print archived activity between two dates as JSON lines, streaming from the archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=date.fromisoformat, help="First day, YYYY-MM-DD.")
+        parser.add_argument('end', type=date.fromisoformat, nargs='?', help="Last day, inclusive (default: start).")
+        parser.add_argument('--action')
+        parser.add_argument('--user', type=int, dest='user_id')
+        parser.add_argument('--ip')
+        parser.add_argument('--dir', default=None, help="Archive directory (default ACTIVITY_ARCHIVE_DIR).")
+
+    def handle(self, *args, **options):
+        end = (options['end'] or options['start']) + timedelta(days=1)
+        filters = {field: options[field] for field in ('action', 'user_id', 'ip') if options[field] is not None}
+        for row in archive.read_archive(options['start'], end, directory=options['dir'], **filters):
+            self.stdout.write(json.dumps(dict(row, timestamp=row['timestamp'].isoformat())))
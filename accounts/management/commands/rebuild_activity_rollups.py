@@ -0,0 +1,18 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts import rollups
+
+
+class Command(BaseCommand):
+    help = ("Recount the activity rollups for the last few days from the raw activity, e.g. to "
+            "backfill them after deploying or after activity was written without them.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ACTIVITY_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        rollups.rebuild(since)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt activity rollups since {since:%Y-%m-%d}."))
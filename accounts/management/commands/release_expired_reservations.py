@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from accounts import inventory
+
+
+class Command(BaseCommand):
+    help = "Return the stock held by expired cart reservations. Run every few minutes from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        released = inventory.release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservations."))
@@ -0,0 +1,124 @@
+import time
+import uuid
+import threading
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction, OperationalError
+from accounts import inventory
+from accounts.checkout import checkout, CheckoutError
+from accounts.models import Cart, UserActivity, add_cart_item
+from products.models import Product, ProductStock
+
+
+class Command(BaseCommand):
+    help = ("Have many concurrent buyers race for the last units of a few products through "
+            "add to cart and checkout, then check that nothing was oversold.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=32)
+        parser.add_argument('--units', type=int, default=5, help="Units left of each product.")
+        parser.add_argument('--products', type=int, default=2,
+                            help="Spread buyers over this many products, to compare contention.")
+        parser.add_argument('--tracking-writers', type=int, default=0,
+                            help="Threads inserting activity rows one by one throughout, to check that "
+                                 "tracking load does not slow checkout down.")
+
+    def handle(self, *args, **options):
+        products = list(Product.objects.exclude(size_variant=None)[:options['products']])
+        if len(products) < options['products']:
+            raise CommandError(f"Needs {options['products']} products with a size variant.")
+
+        rows = []
+        for product in products:
+            size_variant = product.size_variant.first()
+            row, created = ProductStock.objects.get_or_create(product=product, size_variant=size_variant)
+            rows.append((row, None if created else row.stock))
+        ProductStock.objects.filter(uid__in=[row.uid for row, _ in rows]).update(stock=options['units'])
+
+        prefix = f"stock-load-{uuid.uuid4().hex[:8]}"
+        buyers = []
+        for number in range(options['buyers']):
+            user = User.objects.create(username=f"{prefix}-{number}")
+            row = rows[number % len(rows)][0]
+            buyers.append((user, Cart.objects.create(user=user), row))
+
+        results = {row.uid: {'orders': 0, 'sold_out': 0, 'errors': 0} for row, _ in rows}
+        lock = threading.Lock()
+        start = threading.Barrier(len(buyers))
+
+        def buy(user, cart, row):
+            outcome = 'orders'
+            start.wait()
+            try:
+                with transaction.atomic():
+                    inventory.reserve(cart, row.product, row.size_variant)
+                    add_cart_item(cart, row.product, row.size_variant)
+                cart.user = user
+                checkout(cart)
+            except (inventory.OutOfStock, CheckoutError):
+                outcome = 'sold_out'
+            except OperationalError:
+                # SQLite gives up with "database is locked" under heavy write contention.
+                outcome = 'errors'
+            finally:
+                connections.close_all()
+                with lock:
+                    results[row.uid][outcome] += 1
+
+        finished = threading.Event()
+        tracked = []
+
+        def track():
+            rows = 0
+            try:
+                while not finished.is_set():
+                    UserActivity.objects.create(action="Page Visit", page_url=f"/{prefix}/")
+                    rows += 1
+            finally:
+                connections.close_all()
+                with lock:
+                    tracked.append(rows)
+
+        trackers = [threading.Thread(target=track) for _ in range(options['tracking_writers'])]
+        for thread in trackers:
+            thread.start()
+
+        threads = [threading.Thread(target=buy, args=buyer) for buyer in buyers]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+        finished.set()
+        for thread in trackers:
+            thread.join()
+
+        try:
+            oversold = False
+            for row, _ in rows:
+                row.refresh_from_db()
+                result = results[row.uid]
+                self.stdout.write(
+                    f"{row.product.product_name} ({row.size_variant.size_name}): {result['orders']} orders, "
+                    f"{result['sold_out']} sold out, {result['errors']} database errors, {row.stock} left.")
+                if result['orders'] > options['units'] or row.stock < 0:
+                    oversold = True
+            self.stdout.write(
+                f"{len(buyers)} buyers in {elapsed:.2f}s ({len(buyers) / elapsed:.0f} checkouts attempted/s).")
+            if trackers:
+                self.stdout.write(
+                    f"{sum(tracked)} activity rows written meanwhile by {len(trackers)} threads "
+                    f"to the '{router.db_for_write(UserActivity)}' database.")
+        finally:
+            User.objects.filter(username__startswith=f"{prefix}-").delete()
+            UserActivity.objects.filter(page_url=f"/{prefix}/").delete()
+            for row, original in rows:
+                if original is None:
+                    row.delete()
+                else:
+                    ProductStock.objects.filter(uid=row.uid).update(stock=original)
+
+        if oversold:
+            raise CommandError("Oversold.")
+        self.stdout.write(self.style.SUCCESS("No product was oversold."))
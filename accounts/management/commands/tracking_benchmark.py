@@ -0,0 +1,83 @@
+import time
+import asyncio
+from collections import Counter
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from accounts import activity
+from accounts.middleware import UniversalTrackingMiddleware
+from products.models import Product
+
+TRACKING_MIDDLEWARE = 'accounts.middleware.UniversalTrackingMiddleware'
+
+
+class SyncTrackingMiddleware(UniversalTrackingMiddleware):
+    """The tracking middleware as it was before it became async capable: under
+    ASGI the handler has to switch to a thread for it on every request."""
+    async_capable = False
+
+
+class Command(BaseCommand):
+    help = ("Drive the ASGI handler with concurrent requests for the catalog pages and report "
+            "throughput with the tracking middleware async capable, sync only, or removed.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per mode.")
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--mode', choices=['async', 'sync', 'off', 'all'], default='all')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="Page to request; may be repeated. Defaults to the catalog pages.")
+
+    def _middleware(self, mode):
+        middleware = list(settings.MIDDLEWARE)
+        if TRACKING_MIDDLEWARE not in middleware:
+            raise CommandError(f"{TRACKING_MIDDLEWARE} is not in MIDDLEWARE.")
+        index = middleware.index(TRACKING_MIDDLEWARE)
+        if mode == 'off':
+            del middleware[index]
+        elif mode == 'sync':
+            middleware[index] = f"{__name__}.SyncTrackingMiddleware"
+        return middleware
+
+    async def _run(self, paths, total, concurrency):
+        client = AsyncClient()
+        counter = iter(range(total))
+        failures = []
+
+        async def worker():
+            for number in counter:
+                response = await client.get(paths[number % len(paths)])
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+        began = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - began, failures
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        if not paths:
+            product = Product.objects.first()
+            if product is None:
+                raise CommandError("Needs at least one product, or pass --path.")
+            paths = ['/', '/search/?q=shoe', f'/product/{product.slug}/']
+
+        modes = ['off', 'sync', 'async'] if options['mode'] == 'all' else [options['mode']]
+        writer = activity.get_writer()
+        for mode in modes:
+            # AsyncClient sends Host: testserver, which ALLOWED_HOSTS would
+            # answer with a 400 before any middleware or view ran.
+            with override_settings(MIDDLEWARE=self._middleware(mode),
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                elapsed, failures = asyncio.run(
+                    self._run(paths, options['requests'], options['concurrency']))
+            writer.flush()
+            self.stdout.write(
+                f"{mode:>5}: {options['requests'] / elapsed:8.1f} req/s "
+                f"({options['requests']} requests in {elapsed:.2f}s, {len(failures)} failed)")
+            if failures:
+                # A run that mostly failed measured error pages, not the catalog.
+                self.stderr.write(f"       failed with status {dict(Counter(failures))}")
+
+        stats = writer.stats()
+        self.stdout.write(f"Activity rows written: {stats['written']}, dropped: {stats['dropped']}.")
@@ -1,16 +1,63 @@
+import asyncio
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import empty
 from accounts.utils import log_activity
 
+# Tracked request keywords, checked against the path in order.
+KEYWORDS = {
+    "login": "Login Event",
+    "logout": "Logout Event",
+    "cart": "Cart Event",
+    "checkout": "Checkout Event",
+}
+
+
 class UniversalTrackingMiddleware:
+    # Runs natively under both WSGI and ASGI, so an async request is never
+    # handed to a thread just to be tracked. Logging itself only queues the
+    # row (accounts/activity.py); under ASGI it runs as a task after the
+    # response has been returned.
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self._tasks = set()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
         response = self.get_response(request)
+        event = self.get_event(request)
+        if event:
+            log_activity(request, event)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        event = self.get_event(request)
+        if event:
+            # Keep a reference so the task is not garbage collected mid-flight.
+            task = asyncio.create_task(self._alog(request, event))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return response
 
+    async def _alog(self, request, event):
+        # Most views have already loaded request.user (the navbar needs it);
+        # only look the user up again, off the event loop, when they have not.
+        user = getattr(request, "user", None)
+        if user is None or getattr(user, "_wrapped", None) is empty:
+            user = await request.auser()
+        log_activity(request, event, user=user)
+
+    def get_event(self, request):
         # Ignore noise (admin + static)
         if request.path.startswith("/admin") or request.path.startswith("/static"):
-            return response
+            return None
 
         action = "Page Visit"
         data_input = None
@@ -29,24 +76,14 @@ class UniversalTrackingMiddleware:
                 data_input = None
 
         # Detect login/logout/cart automatically from URL
-        keywords = {
-            "login": "Login Event",
-            "logout": "Logout Event",
-            "cart": "Cart Event",
-            "checkout": "Checkout Event",
-        }
-
-        for key, act in keywords.items():
+        for key, act in KEYWORDS.items():
             if key in request.path.lower():
                 action = act
                 break
 
-        # Save activity
-        log_activity(request, {
+        return {
             "action": action,
             "url": request.path,
             "input": data_input,
             "threatScore": 0
-        })
-
-        return response
+        }
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicates(apps, schema_editor):
+    Cart = apps.get_model('accounts', 'Cart')
+    CartItem = apps.get_model('accounts', 'CartItem')
+
+    # Fold every user's extra open carts into their most recently touched one.
+    users = (Cart.objects.filter(is_paid=False, user__isnull=False)
+             .values('user').annotate(carts=Count('uid')).filter(carts__gt=1))
+    for row in users:
+        carts = list(Cart.objects.filter(user_id=row['user'], is_paid=False).order_by('-created_at'))
+        extra = [cart.uid for cart in carts[1:]]
+        CartItem.objects.filter(cart_id__in=extra).update(cart_id=carts[0].uid)
+        Cart.objects.filter(uid__in=extra).delete()
+
+    # Then collapse repeated lines, summing their quantities.
+    lines = (CartItem.objects.values('cart', 'product', 'size_variant')
+             .annotate(lines=Count('uid')).filter(lines__gt=1))
+    for row in lines:
+        items = list(CartItem.objects.filter(
+            cart_id=row['cart'], product_id=row['product'], size_variant_id=row['size_variant'])
+            .order_by('updated_at'))
+        keep = items[0]
+        keep.quantity = sum(item.quantity for item in items)
+        keep.save(update_fields=['quantity'])
+        CartItem.objects.filter(uid__in=[item.uid for item in items[1:]]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_useractivity'),
+        ('products', '0024_product_category_rating_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_paid', False)), fields=('user',), name='unique_open_cart_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('size_variant__isnull', False)), fields=('cart', 'product', 'size_variant'), name='unique_cart_item_size'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('size_variant__isnull', True)), fields=('cart', 'product'), name='unique_cart_item_no_size'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:14
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_cart_uniqueness'),
+        ('products', '0025_productstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('uid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('quantity', models.IntegerField(default=0)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('cart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='accounts.cart')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='products.productstock')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cart', 'stock'), name='unique_cart_stock_reservation')],
+            },
+        ),
+    ]
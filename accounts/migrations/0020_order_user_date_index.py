@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_stockreservation'),
+        ('products', '0025_productstock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-order_date', '-uid'], name='order_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_useractivity_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('minute', 'Minute'), ('day', 'Day')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('action', models.CharField(max_length=200)),
+                ('page_url', models.CharField(blank=True, default='', max_length=500)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'action', 'bucket'], name='rollup_action_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket', 'action', 'page_url'), name='unique_activity_rollup')],
+            },
+        ),
+    ]
@@ -1,8 +1,12 @@
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+from django.utils import timezone
 from django.contrib.auth.models import User
 from base.models import BaseModel
-from products.models import Product, ColorVariant, SizeVariant, Coupon
+from products.models import Product, ColorVariant, SizeVariant, Coupon, ProductStock
 from home.models import ShippingAddress
 from django.conf import settings
 import os
@@ -23,7 +27,12 @@ class Profile(BaseModel):
         return self.user.username
 
     def get_cart_count(self):
-        return CartItem.objects.filter(cart__is_paid=False, cart__user=self.user).count()
+        from accounts.badges import cart_count
+        return cart_count(self.user_id)
+
+
+# The most units of one product and size a cart line may hold.
+MAX_CART_QUANTITY = 99
 
 
 class Cart(BaseModel):
@@ -38,14 +47,72 @@ class Cart(BaseModel):
     razorpay_payment_signature = models.CharField(
         max_length=100, null=True, blank=True)
 
-    def get_cart_total(self):
-        cart_items = self.cart_items.all()
-        total_price = 0
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'], condition=models.Q(is_paid=False), name='unique_open_cart_per_user'),
+        ]
+
+    def get_cart_lines(self):
+        """Cart items with their product and variants loaded and ``line_total``
+        computed in SQL, memoized for the lifetime of this instance."""
+        if '_cart_lines' not in self.__dict__:
+            self._cart_lines = list(
+                self.cart_items.select_related('product', 'size_variant', 'color_variant')
+                .annotate(line_total=line_total_expression())
+                .order_by('updated_at')
+            )
+        return self._cart_lines
+
+    @cached_property
+    def cart_totals(self):
+        return self.cart_items.aggregate(total=Coalesce(Sum(line_total_expression()), 0))
+
+    def refresh_totals(self):
+        """Drop memoized lines and totals after the cart has been modified."""
+        self.__dict__.pop('cart_totals', None)
+        self.__dict__.pop('_cart_lines', None)
+
+    def update_quantities(self, quantities):
+        """Apply ``{cart_item_uid: quantity}`` in one transaction with one DELETE
+        for quantities below one and one bulk UPDATE for the rest, reserving
+        stock for added units and releasing it for removed ones. Changes
+        nothing if it raises: ValueError for a quantity above
+        MAX_CART_QUANTITY, CartItem.DoesNotExist if a uid is not in this cart,
+        inventory.OutOfStock if added units cannot be reserved."""
+        from accounts import inventory
+        if any(quantity > MAX_CART_QUANTITY for quantity in quantities.values()):
+            raise ValueError(f"At most {MAX_CART_QUANTITY} of an item can be ordered.")
+
+        with transaction.atomic():
+            items = self.cart_items.select_related('product').in_bulk(list(quantities))
+            if len(items) != len(quantities):
+                raise CartItem.DoesNotExist("Cart item not found.")
+
+            for uid, quantity in quantities.items():
+                item = items[uid]
+                delta = max(quantity, 0) - item.quantity
+                if delta > 0:
+                    inventory.reserve(self, item.product, item.size_variant_id, delta)
+                elif delta < 0:
+                    inventory.release(self, item.product_id, item.size_variant_id, -delta)
 
-        for cart_item in cart_items:
-            total_price += cart_item.get_product_price()
+            removed = [uid for uid, quantity in quantities.items() if quantity < 1]
+            changed = []
+            for uid, quantity in quantities.items():
+                if quantity >= 1 and items[uid].quantity != quantity:
+                    items[uid].quantity = quantity
+                    changed.append(items[uid])
 
-        return total_price
+            if removed:
+                self.cart_items.filter(uid__in=removed).delete()
+            if changed:
+                CartItem.objects.bulk_update(changed, ['quantity'])
+
+        self.refresh_totals()
+
+    def get_cart_total(self):
+        return self.cart_totals['total']
 
     def get_cart_total_price_after_coupon(self):
         total = self.get_cart_total()
@@ -56,6 +123,15 @@ class Cart(BaseModel):
         return total
 
 
+def line_total_expression():
+    # Mirrors CartItem.get_product_price: variant surcharges are added once per line.
+    return (
+        Coalesce(F('product__price'), 0) * F('quantity')
+        + Coalesce(F('color_variant__price'), 0)
+        + Coalesce(F('size_variant__price'), 0)
+    )
+
+
 class CartItem(BaseModel):
     cart = models.ForeignKey(
         Cart, on_delete=models.CASCADE, related_name="cart_items")
@@ -67,6 +143,18 @@ class CartItem(BaseModel):
         SizeVariant, on_delete=models.SET_NULL, null=True, blank=True)
     quantity = models.IntegerField(default=1)
 
+    class Meta:
+        # Two partial constraints because NULLs never collide in a unique index:
+        # items without a size are kept unique on (cart, product) alone.
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart', 'product', 'size_variant'],
+                condition=models.Q(size_variant__isnull=False), name='unique_cart_item_size'),
+            models.UniqueConstraint(
+                fields=['cart', 'product'],
+                condition=models.Q(size_variant__isnull=True), name='unique_cart_item_no_size'),
+        ]
+
     def get_product_price(self):
         price = self.product.price * self.quantity
 
@@ -79,6 +167,40 @@ class CartItem(BaseModel):
         return price
 
 
+def add_cart_item(cart, product, size_variant=None, quantity=1):
+    """Add ``quantity`` of a product to the cart and return True if a new line
+    was created. An existing line is bumped with a single UPDATE, so
+    concurrent adds never lose an increment; when two requests race to create
+    the same line the unique constraint rejects one, which then updates."""
+    lookup = {'cart': cart, 'product': product, 'size_variant': size_variant}
+    if CartItem.objects.filter(**lookup).update(quantity=F('quantity') + quantity):
+        return False
+
+    try:
+        with transaction.atomic():
+            CartItem.objects.create(quantity=quantity, **lookup)
+        return True
+    except IntegrityError:
+        CartItem.objects.filter(**lookup).update(quantity=F('quantity') + quantity)
+        return False
+
+
+class StockReservation(BaseModel):
+    """Units taken off a stock row and held for a cart until ``expires_at``;
+    see accounts.inventory. A deleted cart leaves its holds for the sweeper."""
+    cart = models.ForeignKey(
+        Cart, on_delete=models.SET_NULL, null=True, blank=True, related_name="reservations")
+    stock = models.ForeignKey(
+        ProductStock, on_delete=models.CASCADE, related_name="reservations")
+    quantity = models.IntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'stock'], name='unique_cart_stock_reservation'),
+        ]
+
+
 class Order(BaseModel):
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="orders")
@@ -92,12 +214,28 @@ class Order(BaseModel):
         Coupon, on_delete=models.SET_NULL, null=True, blank=True)
     grand_total = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-order_date', '-uid'], name='order_user_date_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.order_id} by {self.user.username}"
 
     def get_order_total_price(self):
         return self.order_total_price
 
+    def get_order_items(self):
+        """Order items with their product, variants and the product's colors
+        loaded in two queries, memoized for the lifetime of this instance."""
+        if '_order_items' not in self.__dict__:
+            self._order_items = list(
+                self.order_items.select_related('product', 'size_variant', 'color_variant')
+                .prefetch_related('product__color_variant')
+                .order_by('created_at', 'uid')
+            )
+        return self._order_items
+
 
 class OrderItem(BaseModel):
     order = models.ForeignKey(
@@ -125,14 +263,52 @@ class OrderItem(BaseModel):
         return cart_item.get_product_price()
     
 class UserActivity(models.Model):
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Activity lives in its own database (settings.DATABASE_ROUTES), so there is
+    # no foreign key constraint; accounts.signals clears the user on delete.
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, null=True, blank=True, db_constraint=False, db_index=False)
+    # Set when the request is logged, not when the batch is written.
+    timestamp = models.DateTimeField(default=timezone.now)
     ip = models.CharField(max_length=100, null=True, blank=True)
     action = models.CharField(max_length=200)
     page_url = models.CharField(max_length=500, null=True, blank=True)
     raw_input = models.TextField(null=True, blank=True)
     threat_score = models.IntegerField(default=0)
 
+    class Meta:
+        # Lookups are by time range, or by user or IP over a time range; the
+        # composite indexes also serve plain user and IP lookups.
+        indexes = [
+            models.Index(fields=['timestamp'], name='activity_timestamp_idx'),
+            models.Index(fields=['user', 'timestamp'], name='activity_user_time_idx'),
+            models.Index(fields=['ip', 'timestamp'], name='activity_ip_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.action} - {self.timestamp}"
 
+
+class ActivityRollup(models.Model):
+    """Activity counts per minute and per day by action and URL, added to as
+    activity rows are written (see accounts/rollups.py)."""
+    MINUTE = 'minute'
+    DAY = 'day'
+
+    period = models.CharField(max_length=6, choices=[(MINUTE, 'Minute'), (DAY, 'Day')])
+    bucket = models.DateTimeField()
+    action = models.CharField(max_length=200)
+    page_url = models.CharField(max_length=500, blank=True, default='')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'bucket', 'action', 'page_url'], name='unique_activity_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'action', 'bucket'], name='rollup_action_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.page_url} @ {self.bucket} ({self.period}): {self.count}"
+
@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+# Runs inside the invoice worker processes (see accounts.invoices), which are
+# spawned fresh and never set up Django, so nothing here may import it.
+
+
+def write_pdf(html, path, stale_paths=()):
+    """Render ``html`` to a PDF at ``path``, then delete ``stale_paths``."""
+    from weasyprint import HTML
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            HTML(string=html).write_pdf(target)
+        # Readers only ever see a missing file or a complete one.
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    for stale_path in stale_paths:
+        try:
+            os.remove(stale_path)
+        except FileNotFoundError:
+            pass
+    return path
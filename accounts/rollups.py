@@ -0,0 +1,116 @@
+from collections import Counter
+from datetime import timezone as dt_timezone
+from django.db import IntegrityError, router, transaction
+from django.db.models import Sum
+from accounts.models import ActivityRollup, UserActivity
+
+# Traffic counters by (period, bucket, action, URL) for minute and day buckets
+# in UTC. The activity writer adds each batch of events in the transaction
+# that inserts them, so the rollups always agree with the raw rows; reports
+# read only these tables and never scan UserActivity.
+PERIODS = (ActivityRollup.MINUTE, ActivityRollup.DAY)
+
+
+def bucket_start(timestamp, period):
+    timestamp = timestamp.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    if period == ActivityRollup.DAY:
+        timestamp = timestamp.replace(hour=0, minute=0)
+    return timestamp
+
+
+def count_events(activities):
+    counts = Counter()
+    for activity in activities:
+        for period in PERIODS:
+            counts[(period, bucket_start(activity.timestamp, period), activity.action, activity.page_url or '')] += 1
+    return counts
+
+
+def _add_counts(counts):
+    counts = dict(counts)
+    existing = ActivityRollup.objects.select_for_update().filter(
+        period__in={key[0] for key in counts},
+        bucket__in={key[1] for key in counts},
+        action__in={key[2] for key in counts},
+        page_url__in={key[3] for key in counts},
+    )
+    changed = []
+    for rollup in existing:
+        added = counts.pop((rollup.period, rollup.bucket, rollup.action, rollup.page_url), None)
+        if added:
+            rollup.count += added
+            changed.append(rollup)
+    if changed:
+        ActivityRollup.objects.bulk_update(changed, ['count'])
+    if counts:
+        ActivityRollup.objects.bulk_create([
+            ActivityRollup(period=period, bucket=bucket, action=action, page_url=page_url, count=count)
+            for (period, bucket, action, page_url), count in counts.items()
+        ])
+
+
+def add(activities):
+    """Count ``activities`` (UserActivity instances) into the rollups: one
+    SELECT, one bulk UPDATE and one bulk INSERT however many events."""
+    counts = count_events(activities)
+    if not counts:
+        return
+    database = router.db_for_write(ActivityRollup)
+    try:
+        with transaction.atomic(using=database):
+            _add_counts(counts)
+    except IntegrityError:
+        # Another writer created some of the same rollups first; they are
+        # found and locked on the second pass.
+        with transaction.atomic(using=database):
+            _add_counts(counts)
+
+
+def rebuild(since):
+    """Recount the rollups from ``since`` (rounded down to the day) out of the
+    raw activity still in the database."""
+    start = bucket_start(since, ActivityRollup.DAY)
+    with transaction.atomic(using=router.db_for_write(ActivityRollup)):
+        ActivityRollup.objects.filter(bucket__gte=start).delete()
+        batch = []
+        for activity in UserActivity.objects.filter(timestamp__gte=start).only(
+                'timestamp', 'action', 'page_url').iterator(chunk_size=2000):
+            batch.append(activity)
+            if len(batch) == 2000:
+                _add_counts(count_events(batch))
+                batch = []
+        if batch:
+            _add_counts(count_events(batch))
+
+
+def prune(period, before):
+    deleted, _ = ActivityRollup.objects.filter(period=period, bucket__lt=before).delete()
+    return deleted
+
+
+def _rollups(period, since, action=None, page_url=None):
+    rollups = ActivityRollup.objects.filter(period=period, bucket__gte=bucket_start(since, period))
+    if action:
+        rollups = rollups.filter(action=action)
+    if page_url is not None:
+        rollups = rollups.filter(page_url=page_url)
+    return rollups
+
+
+def series(period, since, action=None, page_url=None):
+    """``[(bucket, count)]`` from ``since``, oldest first; buckets without events are left out."""
+    return list(
+        _rollups(period, since, action, page_url)
+        .values('bucket').annotate(total=Sum('count')).order_by('bucket')
+        .values_list('bucket', 'total')
+    )
+
+
+def totals(period, since, by='action', action=None, page_url=None, limit=None):
+    """``[(action or page_url, count)]`` from ``since``, largest first."""
+    rows = (
+        _rollups(period, since, action, page_url)
+        .values(by).annotate(total=Sum('count')).order_by('-total', by)
+        .values_list(by, 'total')
+    )
+    return list(rows[:limit] if limit else rows)
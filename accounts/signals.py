@@ -1,9 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.signals import user_logged_in
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from accounts.models import Profile
+from accounts import badges
+from accounts.models import Profile, Cart, CartItem, UserActivity
 from accounts.utils import log_activity
+from products.models import Wishlist
 
 
 # ------------------------
@@ -26,5 +28,48 @@ def save_user_profile(sender, instance, **kwargs):
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
     data = {"action": "Login", "url": request.path, "input": "", "threatScore": 0}
-    log_activity(request, data)
+    log_activity(request, data, user=user)
 
+
+@receiver(post_delete, sender=User)
+def clear_user_activity(sender, instance, **kwargs):
+    # UserActivity is in another database, out of reach of the delete cascade.
+    UserActivity.objects.filter(user_id=instance.pk).update(user=None)
+
+
+# ------------------------
+#  NAVBAR BADGE COUNTS
+# ------------------------
+def _cart_user_id(item):
+    cart_field = CartItem._meta.get_field('cart')
+    if cart_field.is_cached(item):
+        return item.cart.user_id
+    return Cart.objects.filter(uid=item.cart_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender=CartItem)
+def cart_item_saved(sender, instance, created, **kwargs):
+    # Quantity changes leave the number of lines alone.
+    if created:
+        badges.schedule_invalidate('cart', _cart_user_id(instance))
+
+
+@receiver(post_delete, sender=CartItem)
+def cart_item_deleted(sender, instance, **kwargs):
+    badges.schedule_invalidate('cart', _cart_user_id(instance))
+
+
+@receiver(post_save, sender=Cart)
+def cart_saved(sender, instance, **kwargs):
+    badges.schedule_invalidate('cart', instance.user_id)
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, **kwargs):
+    badges.schedule_invalidate('profile_image', instance.user_id)
+
+
+@receiver(post_save, sender=Wishlist)
+@receiver(post_delete, sender=Wishlist)
+def wishlist_changed(sender, instance, **kwargs):
+    badges.schedule_invalidate('wishlist', instance.user_id)
@@ -1,3 +1,304 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet, Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from accounts import inventory
+from accounts.checkout import CheckoutError, checkout
+from accounts.models import MAX_CART_QUANTITY, Cart, CartItem, Order, OrderItem, StockReservation, add_cart_item
+from products.models import Category, Coupon, Product, ProductStock, SizeVariant
 
-# Create your tests here.
+# Keeps the version counters and cached tables of one run out of the next.
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_product(name="Runner", price=100, category=None):
+    category = category or Category.objects.get_or_create(category_name="Sneakers")[0]
+    return Product.objects.create(
+        product_name=name, category=category, price=price, product_desription="A shoe.")
+
+
+def make_cart(username="buyer"):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com", password="pw")
+    return Cart.objects.create(user=user)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class AddCartItemTests(TransactionTestCase):
+    def setUp(self):
+        self.cart = make_cart()
+        self.product = make_product()
+        self.size = SizeVariant.objects.create(size_name="8")
+
+    def test_repeated_add_increments_one_line(self):
+        self.assertTrue(add_cart_item(self.cart, self.product, self.size))
+        self.assertFalse(add_cart_item(self.cart, self.product, self.size))
+        self.assertFalse(add_cart_item(self.cart, self.product, self.size, quantity=3))
+
+        line = CartItem.objects.get(cart=self.cart)
+        self.assertEqual(line.quantity, 5)
+
+    def test_sizes_and_products_get_their_own_lines(self):
+        other_size = SizeVariant.objects.create(size_name="9")
+        add_cart_item(self.cart, self.product, self.size)
+        add_cart_item(self.cart, self.product, other_size)
+        add_cart_item(self.cart, self.product)
+        add_cart_item(self.cart, make_product("Trail"))
+
+        self.assertEqual(CartItem.objects.filter(cart=self.cart).count(), 4)
+
+    def test_constraint_rejects_duplicate_line_with_size(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, size_variant=self.size)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=self.cart, product=self.product, size_variant=self.size)
+
+    def test_constraint_rejects_duplicate_line_without_size(self):
+        CartItem.objects.create(cart=self.cart, product=self.product)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CartItem.objects.create(cart=self.cart, product=self.product)
+
+    def test_lost_create_race_falls_back_to_update(self):
+        # Another request creates the line between this request's UPDATE (which
+        # matched nothing) and its INSERT.
+        CartItem.objects.create(cart=self.cart, product=self.product, size_variant=self.size, quantity=2)
+        update = QuerySet.update
+        calls = []
+
+        def miss_first(queryset, **kwargs):
+            calls.append(kwargs)
+            return 0 if len(calls) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', miss_first):
+            created = add_cart_item(self.cart, self.product, self.size)
+
+        self.assertFalse(created)
+        self.assertEqual(len(calls), 2)
+        line = CartItem.objects.get(cart=self.cart)
+        self.assertEqual(line.quantity, 3)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class InventoryTests(TransactionTestCase):
+    def setUp(self):
+        self.product = make_product()
+        self.size = SizeVariant.objects.create(size_name="8")
+        self.stock = ProductStock.objects.create(product=self.product, size_variant=self.size, stock=2)
+
+    def add(self, cart, quantity=1):
+        # What the add_to_cart view does.
+        with transaction.atomic():
+            inventory.reserve(cart, self.product, self.size, quantity)
+            add_cart_item(cart, self.product, self.size, quantity)
+
+    def units(self):
+        self.stock.refresh_from_db()
+        return self.stock.stock
+
+    def held(self, cart=None):
+        holds = StockReservation.objects.filter(stock=self.stock)
+        if cart is not None:
+            holds = holds.filter(cart=cart)
+        return holds.aggregate(total=Sum('quantity'))['total'] or 0
+
+    def test_reservations_never_oversell(self):
+        carts = [make_cart(f"buyer{number}") for number in range(3)]
+        self.add(carts[0])
+        self.add(carts[1])
+        with self.assertRaises(inventory.OutOfStock):
+            self.add(carts[2])
+        with self.assertRaises(inventory.OutOfStock):
+            self.add(carts[0], quantity=2)
+
+        self.assertEqual(self.units(), 0)
+        self.assertEqual(self.held(), 2)
+        self.assertFalse(CartItem.objects.filter(cart=carts[2]).exists())
+        self.assertEqual(CartItem.objects.get(cart=carts[0]).quantity, 1)
+
+    def test_untracked_items_are_always_available(self):
+        cart = make_cart()
+        inventory.reserve(cart, make_product("Trail"), self.size, quantity=50)
+        inventory.reserve(cart, self.product, None, quantity=50)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_takes_units_beyond_the_hold(self):
+        cart = make_cart()
+        self.add(cart)
+        CartItem.objects.filter(cart=cart).update(quantity=2)
+
+        checkout(cart)
+
+        self.assertEqual(self.units(), 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_returns_units_held_beyond_the_order(self):
+        cart = make_cart()
+        self.add(cart, quantity=2)
+        CartItem.objects.filter(cart=cart).update(quantity=1)
+
+        checkout(cart)
+
+        self.assertEqual(self.units(), 1)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_without_enough_stock_rolls_back(self):
+        cart = make_cart()
+        self.add(cart)
+        CartItem.objects.filter(cart=cart).update(quantity=4)
+
+        with self.assertRaises(CheckoutError):
+            checkout(cart)
+
+        self.assertEqual(self.units(), 1)
+        self.assertEqual(self.held(cart), 1)
+        self.assertFalse(Cart.objects.get(uid=cart.uid).is_paid)
+
+    def test_release_expired_returns_units_and_deletes_holds(self):
+        expired, current = make_cart("expired"), make_cart("current")
+        self.add(expired)
+        self.add(current)
+        StockReservation.objects.filter(cart=expired).update(
+            expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(inventory.release_expired(), 1)
+
+        self.assertEqual(self.units(), 1)
+        self.assertEqual(self.held(expired), 0)
+        self.assertEqual(self.held(current), 1)
+        self.assertEqual(inventory.release_expired(), 0)
+
+    def test_lowering_a_line_shrinks_its_hold(self):
+        self.stock.stock = 5
+        self.stock.save()
+        cart = make_cart()
+        self.add(cart, quantity=3)
+        line = CartItem.objects.get(cart=cart)
+
+        cart.update_quantities({line.uid: 1})
+
+        self.assertEqual(self.units(), 4)
+        self.assertEqual(self.held(cart), 1)
+
+    def test_removing_a_line_releases_its_hold(self):
+        cart = make_cart()
+        self.add(cart, quantity=2)
+        line = CartItem.objects.get(cart=cart)
+
+        cart.update_quantities({line.uid: 0})
+
+        self.assertEqual(self.units(), 2)
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertFalse(CartItem.objects.filter(cart=cart).exists())
+
+    def test_raising_a_line_reserves_the_added_units(self):
+        cart = make_cart()
+        self.add(cart)
+        line = CartItem.objects.get(cart=cart)
+
+        cart.update_quantities({line.uid: 2})
+
+        self.assertEqual(self.units(), 0)
+        self.assertEqual(self.held(cart), 2)
+
+    def test_quantity_change_without_stock_changes_nothing(self):
+        other = make_product("Trail")
+        cart = make_cart()
+        self.add(cart)
+        add_cart_item(cart, other)
+        lines = {line.product_id: line for line in CartItem.objects.filter(cart=cart)}
+
+        with self.assertRaises(inventory.OutOfStock):
+            cart.update_quantities({lines[other.uid].uid: 0, lines[self.product.uid].uid: 3})
+
+        self.assertEqual(self.units(), 1)
+        self.assertEqual(self.held(cart), 1)
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 2)
+
+    def test_quantity_above_the_maximum_is_rejected(self):
+        cart = make_cart()
+        self.add(cart)
+        line = CartItem.objects.get(cart=cart)
+
+        with self.assertRaises(ValueError):
+            cart.update_quantities({line.uid: MAX_CART_QUANTITY + 1})
+
+        self.assertEqual(CartItem.objects.get(cart=cart).quantity, 1)
+        self.assertEqual(self.units(), 1)
+
+    def test_release_never_returns_more_than_is_held(self):
+        cart = make_cart()
+        self.add(cart)
+        CartItem.objects.filter(cart=cart).update(quantity=2)
+        line = CartItem.objects.get(cart=cart)
+
+        cart.update_quantities({line.uid: 0})
+
+        self.assertEqual(self.units(), 2)
+        self.assertFalse(StockReservation.objects.exists())
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class CheckoutTests(TransactionTestCase):
+    def setUp(self):
+        self.cart = make_cart()
+        self.size = SizeVariant.objects.create(size_name="8", price=10)
+        self.runner = make_product("Runner", price=100)
+        self.trail = make_product("Trail", price=250)
+        add_cart_item(self.cart, self.runner, self.size, quantity=2)
+        add_cart_item(self.cart, self.trail)
+
+    def test_cart_is_claimed_once(self):
+        # Both requests loaded the open cart before either checked out.
+        first, second = Cart.objects.get(uid=self.cart.uid), Cart.objects.get(uid=self.cart.uid)
+        checkout(first)
+
+        with self.assertRaises(CheckoutError):
+            checkout(second)
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertTrue(Cart.objects.get(uid=self.cart.uid).is_paid)
+
+    def test_order_items_are_bulk_created_with_line_prices(self):
+        with CaptureQueriesContext(connection) as queries:
+            order = checkout(self.cart)
+
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "accounts_orderitem"')]
+        self.assertEqual(len(inserts), 1)
+        prices = {item.product_id: (item.quantity, item.product_price) for item in OrderItem.objects.filter(order=order)}
+        # The size surcharge is added once per line, as in the cart.
+        self.assertEqual(prices, {self.runner.uid: (2, 210), self.trail.uid: (1, 250)})
+        self.assertEqual(order.order_total_price, 460)
+        self.assertEqual(order.grand_total, 460)
+
+    def test_grand_total_takes_off_the_coupon_discount(self):
+        self.cart.coupon = Coupon.objects.create(coupon_code="SAVE50", discount_amount=50, minimum_amount=400)
+        self.cart.save()
+
+        order = checkout(self.cart)
+
+        self.assertEqual(order.coupon, self.cart.coupon)
+        self.assertEqual(order.grand_total, order.order_total_price - 50)
+        self.assertEqual(order.grand_total, 410)
+
+    def test_expired_coupon_is_dropped(self):
+        self.cart.coupon = Coupon.objects.create(coupon_code="OLD", discount_amount=50, minimum_amount=0)
+        self.cart.save()
+        Coupon.objects.filter(uid=self.cart.coupon.uid).update(is_expired=True)
+        cart = Cart.objects.select_related('coupon').get(uid=self.cart.uid)
+
+        order = checkout(cart)
+
+        self.assertIsNone(order.coupon)
+        self.assertEqual(order.grand_total, order.order_total_price)
+
+    def test_coupon_below_its_minimum_is_dropped(self):
+        self.cart.coupon = Coupon.objects.create(coupon_code="BIG", discount_amount=100, minimum_amount=1000)
+        self.cart.save()
+
+        order = checkout(self.cart)
+
+        self.assertIsNone(order.coupon)
+        self.assertEqual(order.grand_total, 460)
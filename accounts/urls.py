@@ -1,9 +1,10 @@
 from django.urls import path
 from accounts.views import (
     login_page, register_page, user_logout, activate_email_account,
-    change_password, add_to_cart, update_cart_item, cart, success,
+    change_password, add_to_cart, update_cart_item, update_cart_items, cart, success,
     profile_view, update_shipping_address, order_history,
-    delete_account, remove_cart, remove_coupon, order_details
+    delete_account, remove_cart, apply_coupon, remove_coupon, order_details, download_invoice,
+    activity_dashboard, activity_rollups
 )
 from django.contrib.auth import views as auth_views
 
@@ -64,7 +65,9 @@ urlpatterns = [
     path('cart/', cart, name="cart"),
     path('add-to-cart/<uid>/', add_to_cart, name="add_to_cart"),
     path('update_cart_item/', update_cart_item, name='update_cart_item'),
+    path('update_cart_items/', update_cart_items, name='update_cart_items'),
     path('remove-cart/<uid>/', remove_cart, name="remove_cart"),
+    path('apply-coupon/', apply_coupon, name="apply_coupon"),
     path('remove-coupon/<cart_id>/', remove_coupon, name="remove_coupon"),
 
 
@@ -72,5 +75,11 @@ urlpatterns = [
     path('success/', success, name="success"),
     path('order-history/', order_history, name='order_history'),
     path('order/<str:order_id>/', order_details, name='order_details'),
+    path('order/<str:order_id>/invoice/', download_invoice, name='download_invoice'),
     path('delete-account/', delete_account, name='delete_account'),
+
+
+    # -------- ACTIVITY (staff) --------
+    path('activity/', activity_dashboard, name='activity_dashboard'),
+    path('activity/rollups/', activity_rollups, name='activity_rollups'),
 ]
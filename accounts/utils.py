@@ -1,11 +1,17 @@
+from django.utils import timezone
+from accounts import activity
 from accounts.models import UserActivity
 
-def log_activity(request, data):
-    UserActivity.objects.create(
-        user=request.user if request.user.is_authenticated else None,
+def log_activity(request, data, user=None):
+    # Queued for the background writer (accounts/activity.py), not saved here.
+    # Async callers pass the user from ``await request.auser()``.
+    user = user if user is not None else request.user
+    activity.record(UserActivity(
+        user_id=user.pk if user.is_authenticated else None,
+        timestamp=timezone.now(),
         ip=request.META.get("REMOTE_ADDR"),
         action=data.get("action", "Unknown"),
         page_url=data.get("url"),
         raw_input=data.get("input") or str(data),
         threat_score=data.get("threatScore", 0)
-    )
+    ))
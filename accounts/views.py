@@ -1,23 +1,34 @@
 import os
 import json
 import uuid
-from weasyprint import CSS, HTML
+from datetime import timedelta
 from django.conf import settings
+from django.db import transaction
+from django.core.exceptions import ValidationError
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, FileResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.views.decorators.http import require_POST
+from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.contrib.auth import views as auth_views
 
-from accounts.models import Profile, Cart, CartItem, Order, OrderItem
+from accounts.models import Profile, Cart, CartItem, Order, OrderItem, ActivityRollup, add_cart_item, MAX_CART_QUANTITY
+from accounts import inventory, invoices, rollups
+from accounts.checkout import checkout, CheckoutError
 from accounts.forms import UserUpdateForm, UserProfileForm, ShippingAddressForm, CustomPasswordChangeForm
 from home.models import ShippingAddress
 from base.emails import send_account_activation_email
-from products.models import Product, SizeVariant
+from products.models import Product
+from products.reference import get_size_or_404
+from products import coupons
+from base.pagination import KeysetPaginator, InvalidCursor
+
+ORDERS_PER_PAGE = 20
 
 
 # ============================ AUTH ============================
@@ -151,15 +162,15 @@ def add_to_cart(request, uid):
 
     product = get_object_or_404(Product, uid=uid)
     cart, _ = Cart.objects.get_or_create(user=request.user, is_paid=False)
-    size_variant = get_object_or_404(SizeVariant, size_name=variant)
-
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, product=product, size_variant=size_variant
-    )
+    size_variant = get_size_or_404(variant)
 
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    try:
+        with transaction.atomic():
+            inventory.reserve(cart, product, size_variant)
+            add_cart_item(cart, product, size_variant)
+    except inventory.OutOfStock as e:
+        messages.error(request, str(e))
+        return redirect(request.META.get("HTTP_REFERER", "cart"))
 
     messages.success(request, "Added to cart.")
     return redirect("cart")
@@ -173,29 +184,85 @@ def update_cart_item(request):
         item_id = data.get("cart_item_id")
         qty = int(data.get("quantity"))
 
-        item = CartItem.objects.get(uid=item_id, cart__user=request.user, cart__is_paid=False)
-        item.quantity = qty
-        item.save()
+        item = CartItem.objects.select_related("cart").get(
+            uid=item_id, cart__user=request.user, cart__is_paid=False)
+        item.cart.update_quantities({item.uid: qty})
 
         return JsonResponse({"success": True})
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
 
 
+def cart_summary(user_cart):
+    """Line totals and cart totals as sent back to the cart page."""
+    lines = user_cart.get_cart_lines()
+    total = user_cart.get_cart_total()
+    total_after_coupon = user_cart.get_cart_total_price_after_coupon()
+    return {
+        "success": True,
+        "items": [
+            {"cart_item_id": str(line.uid), "quantity": line.quantity, "line_total": line.line_total}
+            for line in lines
+        ],
+        "cart_count": len(lines),
+        "coupon": user_cart.coupon.coupon_code if user_cart.coupon else None,
+        "total": total,
+        "discount": total - total_after_coupon,
+        "total_after_coupon": total_after_coupon,
+    }
+
+
+@require_POST
+@login_required
+def update_cart_items(request):
+    """Apply a batch of ``{cart_item_id, quantity}`` operations at once; a
+    quantity of zero (or ``"remove": true``) removes the item."""
+    try:
+        quantities = {}
+        for operation in json.loads(request.body)["operations"]:
+            quantity = 0 if operation.get("remove") else int(operation["quantity"])
+            if not 0 <= quantity <= MAX_CART_QUANTITY:
+                raise ValueError(quantity)
+            quantities[uuid.UUID(str(operation["cart_item_id"]))] = quantity
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"success": False, "error": "Invalid cart update."}, status=400)
+
+    user_cart = Cart.objects.filter(is_paid=False, user=request.user).select_related("coupon").first()
+    if not user_cart:
+        return JsonResponse({"success": False, "error": "Your cart is empty."}, status=404)
+
+    try:
+        user_cart.update_quantities(quantities)
+    except CartItem.DoesNotExist:
+        return JsonResponse({"success": False, "error": "Cart item not found."}, status=404)
+    except inventory.OutOfStock as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=409)
+
+    return JsonResponse(cart_summary(user_cart))
+
+
 @login_required
 def cart(request):
-    user_cart = Cart.objects.filter(is_paid=False, user=request.user).first()
+    user_cart = Cart.objects.filter(is_paid=False, user=request.user).select_related("coupon").first()
 
     if not user_cart:
         messages.warning(request, "Your cart is empty.")
         return redirect("index")
 
     if request.method == "POST":
-        request.session["dummy_payment"] = True
+        user_cart.user = request.user
+        try:
+            order = checkout(user_cart)
+        except CheckoutError as e:
+            messages.error(request, str(e))
+            return redirect("cart")
+
+        request.session["order_id"] = order.order_id
         return redirect("success")
 
     return render(request, "accounts/cart.html", {
         "cart": user_cart,
+        "cart_items": user_cart.get_cart_lines(),
         "quantity_range": range(1, 6)
     })
 
@@ -266,7 +333,17 @@ def update_shipping_address(request):
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by("-order_date")
+    paginator = KeysetPaginator(
+        Order.objects.filter(user=request.user),
+        per_page=ORDERS_PER_PAGE,
+        ordering=("-order_date", "-uid"),
+    )
+
+    try:
+        orders = paginator.page(after=request.GET.get("after"), before=request.GET.get("before"))
+    except (InvalidCursor, ValidationError):
+        orders = paginator.page()
+
     return render(request, "accounts/order_history.html", {"orders": orders})
 
 
@@ -285,8 +362,9 @@ def delete_account(request):
 @login_required
 def remove_cart(request, uid):
     try:
-        item = CartItem.objects.get(uid=uid, cart__user=request.user, cart__is_paid=False)
-        item.delete()
+        item = CartItem.objects.select_related("cart").get(
+            uid=uid, cart__user=request.user, cart__is_paid=False)
+        item.cart.update_quantities({item.uid: 0})
         messages.success(request, "Item removed.")
 
     except:
@@ -295,6 +373,51 @@ def remove_cart(request, uid):
     return redirect(request.META.get("HTTP_REFERER", "cart"))
 
 
+@require_POST
+@login_required
+def apply_coupon(request):
+    """Validate a coupon code against the open cart and apply it. Answers
+    with the recomputed totals as JSON, or redirects back to the cart for a
+    plain form post."""
+    wants_json = "application/json" in request.headers.get("Accept", "")
+    if request.content_type == "application/json":
+        try:
+            code = json.loads(request.body).get("coupon")
+        except (ValueError, AttributeError):
+            code = None
+    else:
+        code = request.POST.get("coupon")
+
+    def fail(error, status=400):
+        if wants_json:
+            return JsonResponse({"success": False, "error": error}, status=status)
+        messages.warning(request, error)
+        return redirect("cart")
+
+    user_cart = Cart.objects.filter(is_paid=False, user=request.user).select_related("coupon").first()
+    if not user_cart:
+        return fail("Your cart is empty.", status=404)
+
+    coupon = coupons.get_active_coupon(code)
+    if coupon is None:
+        return fail("Invalid or expired coupon code.")
+    if user_cart.coupon_id == coupon.uid:
+        return fail("Coupon already applied.")
+    coupon = coupons.confirm(coupon)
+    if coupon is None:
+        return fail("Invalid or expired coupon code.")
+    if user_cart.get_cart_total() < coupon.minimum_amount:
+        return fail(f"Coupon {coupon.coupon_code} needs a cart total of at least ₹{coupon.minimum_amount}.")
+
+    Cart.objects.filter(uid=user_cart.uid).update(coupon=coupon)
+    user_cart.coupon = coupon
+
+    if wants_json:
+        return JsonResponse(cart_summary(user_cart))
+    messages.success(request, f"Coupon {coupon.coupon_code} applied.")
+    return redirect("cart")
+
+
 @login_required
 def remove_coupon(request, cart_id):
     try:
@@ -308,6 +431,91 @@ def remove_coupon(request, cart_id):
     return redirect(request.META.get("HTTP_REFERER", "cart"))
 
 
+@login_required
 def order_details(request, order_id):
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
-    return render(request, "order/order_details.html", {"order": order})
+    order = get_object_or_404(
+        Order.objects.select_related("user", "coupon"), order_id=order_id, user=request.user)
+    return render(request, "accounts/order_details.html", {
+        "order": order,
+        "order_items": order.get_order_items(),
+    })
+
+
+@login_required
+def download_invoice(request, order_id):
+    """Serve the order's invoice PDF, or report that it is still rendering.
+    ``?status=1`` only reports the status, for the order page to poll."""
+    order = get_object_or_404(
+        Order.objects.select_related("user", "coupon"), order_id=order_id, user=request.user)
+    status, path = invoices.get_invoice(order)
+
+    if status == invoices.READY and not request.GET.get("status"):
+        return FileResponse(
+            open(path, "rb"), as_attachment=True,
+            filename=f"invoice_{order.order_id}.pdf", content_type="application/pdf")
+
+    if status == invoices.RENDERING:
+        response = JsonResponse({"status": status}, status=202)
+        response["Retry-After"] = "2"
+        return response
+    if status == invoices.FAILED:
+        return JsonResponse({"status": status, "error": "Could not generate the invoice."}, status=500)
+    return JsonResponse({"status": status})
+
+
+# ============================ ACTIVITY DASHBOARD ============================
+
+# Default and largest number of periods a rollup query may cover.
+ROLLUP_WINDOWS = {
+    ActivityRollup.MINUTE: (60, 24 * 60),
+    ActivityRollup.DAY: (30, 366),
+}
+
+
+def _rollup_since(period, last):
+    step = timedelta(minutes=1) if period == ActivityRollup.MINUTE else timedelta(days=1)
+    return rollups.bucket_start(timezone.now() - step * (last - 1), period)
+
+
+@staff_member_required
+def activity_dashboard(request):
+    today = _rollup_since(ActivityRollup.DAY, 1)
+    last_hour = _rollup_since(ActivityRollup.MINUTE, 60)
+    return render(request, "accounts/activity_dashboard.html", {
+        "actions_today": rollups.totals(ActivityRollup.DAY, today),
+        "top_urls_today": rollups.totals(ActivityRollup.DAY, today, by="page_url", limit=10),
+        "searches_last_hour": rollups.series(ActivityRollup.MINUTE, last_hour, action="Search Query"),
+        "events_last_hour": rollups.totals(ActivityRollup.MINUTE, last_hour),
+        "daily": rollups.series(ActivityRollup.DAY, _rollup_since(ActivityRollup.DAY, 30)),
+    })
+
+
+@staff_member_required
+def activity_rollups(request):
+    """Event counts from the rollups. Takes ``period`` (minute or day),
+    ``last`` (how many periods, up to today), and optional ``action`` and
+    ``url`` filters."""
+    period = request.GET.get("period", ActivityRollup.MINUTE)
+    if period not in ROLLUP_WINDOWS:
+        return JsonResponse({"error": "period must be minute or day."}, status=400)
+
+    default, most = ROLLUP_WINDOWS[period]
+    try:
+        last = int(request.GET.get("last", default))
+    except ValueError:
+        return JsonResponse({"error": "last must be a number."}, status=400)
+    if not 1 <= last <= most:
+        return JsonResponse({"error": f"last must be between 1 and {most}."}, status=400)
+
+    since = _rollup_since(period, last)
+    action = request.GET.get("action") or None
+    page_url = request.GET.get("url")
+    return JsonResponse({
+        "period": period,
+        "since": since,
+        "series": [
+            {"bucket": bucket, "count": count}
+            for bucket, count in rollups.series(period, since, action=action, page_url=page_url)
+        ],
+        "actions": dict(rollups.totals(period, since, action=action, page_url=page_url)),
+    })
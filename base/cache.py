@@ -0,0 +1,46 @@
+import time
+import hashlib
+from django.core.cache import cache
+from django.db import transaction
+
+# Version stamps kept in the shared cache (settings.CACHES). Cache keys built
+# from them go stale the moment the stamp changes, so nothing ever has to be
+# deleted explicitly and every worker sees the change on its next read. Bumps
+# wait for the surrounding transaction to commit, so no reader can cache
+# uncommitted or pre-commit rows under the new version.
+
+
+def _key(name):
+    return f"version:{name}"
+
+
+def _new_version():
+    # A fresh stamp rather than an increment: the file cache's incr() is a
+    # read then a write, so two workers bumping at once could both write the
+    # same number and one bump would be lost. Time based so that a stamp the
+    # cache evicted is never reissued while its old entries may be cached.
+    return time.time_ns()
+
+
+def get_version(name):
+    version = cache.get(_key(name))
+    if version is None:
+        cache.add(_key(name), _new_version(), timeout=None)
+        version = cache.get(_key(name), 1)
+    return version
+
+
+def _bump(name):
+    cache.set(_key(name), _new_version(), timeout=None)
+
+
+def bump_version(name):
+    """Bump ``name`` once the current transaction commits (straight away
+    outside a transaction)."""
+    transaction.on_commit(lambda: _bump(name))
+
+
+def make_key(prefix, *parts):
+    """Build a short, backend-safe cache key from arbitrary (user supplied) parts."""
+    digest = hashlib.md5('|'.join(str(part or '') for part in parts).encode()).hexdigest()
+    return f"{prefix}:{digest}"
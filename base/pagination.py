@@ -0,0 +1,169 @@
+import json
+import base64
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, number, ordering=None):
+    payload = {"v": values, "n": number}
+    if ordering is not None:
+        payload["o"] = ",".join(ordering)
+    payload = json.dumps(payload, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, fields=None, ordering=None):
+    """Return ``(values, number)`` from a cursor. With ``ordering`` the cursor
+    must have been made for that ordering, and with ``fields`` (the model
+    fields of the ordering) it must hold one non-null value per field,
+    converted with the field's ``to_python``; anything else, such as a
+    tampered cursor, raises InvalidCursor rather than failing in the query."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        values, number = payload["v"], int(payload["n"])
+        if not isinstance(values, list):
+            raise TypeError("cursor values must be a list")
+        if ordering is not None and payload.get("o") != ",".join(ordering):
+            raise ValueError("cursor was made for another ordering")
+        if fields is not None:
+            if len(values) != len(fields):
+                raise ValueError("cursor does not match the ordering")
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+            if any(value is None for value in values):
+                raise ValueError("cursor values cannot be null")
+        return values, number
+    except (ValueError, KeyError, TypeError, ValidationError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset.
+
+    Exposes the same ``has_next`` / ``has_previous`` / ``number`` attributes
+    as Django's ``Page`` so templates read the same, but navigation goes
+    through opaque ``next_cursor`` / ``previous_cursor`` values instead of
+    page numbers.
+    """
+
+    def __init__(self, object_list, paginator, number, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Cursor pagination over ``(sort key, ..., uid)``.
+
+    Each page is a single ``WHERE (key, uid) > (last_key, last_uid) LIMIT n``
+    range scan, so page 50 costs the same as page 1 and no ``COUNT(*)`` is
+    issued. ``ordering`` must end with a unique column (``uid``) so that the
+    cursor position is never ambiguous.
+
+    ``approximate_count`` turns on a cached row count, refreshed at most every
+    ``count_timeout`` seconds, which is only used to print "page x of ~y".
+    """
+
+    def __init__(self, queryset, per_page, ordering, approximate_count=False,
+                 count_cache_key=None, count_timeout=300):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.approximate_count = approximate_count
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout
+
+    @property
+    def fields(self):
+        return [field.lstrip("-") for field in self.ordering]
+
+    @property
+    def num_pages(self):
+        if not self.approximate_count:
+            return None
+        count = None
+        if self.count_cache_key:
+            count = cache.get(self.count_cache_key)
+        if count is None:
+            count = self.queryset.order_by().count()
+            if self.count_cache_key:
+                cache.set(self.count_cache_key, count, self.count_timeout)
+        return max(1, -(-count // self.per_page))
+
+    def _position_filter(self, values, reverse=False):
+        # Builds (a > x) OR (a = x AND b > y) OR ... for the row comparison,
+        # flipping the operator per column for descending keys.
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            name = field.lstrip("-")
+            descending = field.startswith("-") != reverse
+            lookup = "%s__%s" % (name, "lt" if descending else "gt")
+            clause = Q(**{lookup: values[index]})
+            for previous, value in zip(self.fields[:index], values[:index]):
+                clause &= Q(**{previous: value})
+            condition |= clause
+        return condition
+
+    def _model_fields(self):
+        opts = self.queryset.model._meta
+        return [opts.get_field(name) for name in self.fields]
+
+    def _decode(self, cursor):
+        return decode_cursor(cursor, self._model_fields(), self.ordering)
+
+    def _reversed_ordering(self):
+        return [field[1:] if field.startswith("-") else "-" + field for field in self.ordering]
+
+    def _cursor_for(self, obj, number):
+        return encode_cursor([getattr(obj, field) for field in self.fields], number, self.ordering)
+
+    def page(self, after=None, before=None):
+        queryset = self.queryset
+        number = 1
+
+        if before:
+            values, number = self._decode(before)
+            rows = list(
+                queryset.filter(self._position_filter(values, reverse=True))
+                .order_by(*self._reversed_ordering())[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            number = max(1, number - 1)
+            has_previous = has_more
+            has_next = True
+        else:
+            if after:
+                values, number = self._decode(after)
+                queryset = queryset.filter(self._position_filter(values))
+                number += 1
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_previous = bool(after)
+
+        next_cursor = self._cursor_for(rows[-1], number) if has_next and rows else None
+        previous_cursor = self._cursor_for(rows[0], number) if has_previous and rows else None
+        return KeysetPage(rows, self, number, next_cursor, previous_cursor)
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Sends the models named in settings.DATABASE_ROUTES ("app_label.model_name"
+# to database alias) to their own database. Tables written on every request
+# live in a separate SQLite file there, so their writes never wait for the
+# one write lock that carts, checkout and stock updates share. A routed
+# database only ever gets the tables routed to it; everything else stays on
+# the default database.
+
+
+def _routes():
+    return getattr(settings, 'DATABASE_ROUTES', {})
+
+
+def _alias(app_label, model_name):
+    return _routes().get(f"{app_label}.{model_name}")
+
+
+class ModelDatabaseRouter:
+    def _db_for(self, model, hints):
+        alias = _alias(model._meta.app_label, model._meta.model_name)
+        if alias:
+            return alias
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in _routes().values():
+            # e.g. activity.user: Django would otherwise look for the user in
+            # the database the activity row came from.
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Keys into a routed model's database are declared with
+        # db_constraint=False, so they may point across databases.
+        if _alias(obj1._meta.app_label, obj1._meta.model_name) or \
+                _alias(obj2._meta.app_label, obj2._meta.model_name):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = _alias(app_label, model_name) if model_name else None
+        if alias:
+            return db == alias
+        if db != DEFAULT_DB_ALIAS and db in _routes().values():
+            return False
+        return None
@@ -0,0 +1,96 @@
+import json
+import base64
+from django.test import TestCase
+from base.pagination import InvalidCursor, KeysetPaginator, decode_cursor, encode_cursor
+from home.views import DEFAULT_ORDERING, SORT_ORDERINGS
+from products.models import Category, Product
+
+ORDERINGS = [DEFAULT_ORDERING, *SORT_ORDERINGS.values()]
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(category_name=name) for name in ("Boots", "Sneakers")]
+        # Few distinct prices, categories and ratings, so most sort keys tie.
+        for number in range(23):
+            Product.objects.create(
+                product_name=f"Shoe {number}",
+                category=categories[number % 2],
+                price=100 + number % 3 * 50,
+                product_desription="A shoe.",
+            )
+        for number, product in enumerate(Product.objects.order_by('uid')):
+            Product.objects.filter(uid=product.uid).update(average_rating=number % 4)
+
+    def paginator(self, ordering, per_page=5):
+        return KeysetPaginator(Product.objects.all(), per_page=per_page, ordering=ordering)
+
+    def walk(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        forwards = [product.uid for page in pages for product in page]
+
+        backwards = list(pages[-1])
+        page = pages[-1]
+        while page.has_previous():
+            page = paginator.page(before=page.previous_cursor)
+            backwards = list(page) + backwards
+        return pages, forwards, [product.uid for product in backwards]
+
+    def test_every_ordering_walks_all_rows_both_ways(self):
+        for ordering in ORDERINGS:
+            with self.subTest(ordering=ordering):
+                expected = list(Product.objects.order_by(*ordering).values_list('uid', flat=True))
+                pages, forwards, backwards = self.walk(self.paginator(ordering))
+
+                self.assertEqual(forwards, expected)
+                self.assertEqual(backwards, expected)
+                self.assertEqual([page.number for page in pages], list(range(1, len(pages) + 1)))
+                self.assertTrue(all(len(page) == 5 for page in pages[:-1]))
+
+    def test_ties_on_the_sort_key_are_broken_by_uid(self):
+        for ordering in (('price', 'uid'), ('-price', '-uid')):
+            with self.subTest(ordering=ordering):
+                # Pages of two split every group of equal prices.
+                _, forwards, _ = self.walk(self.paginator(ordering, per_page=2))
+                rows = Product.objects.in_bulk(forwards)
+                keys = [(rows[uid].price, uid) for uid in forwards]
+
+                self.assertEqual(len(set(forwards)), Product.objects.count())
+                self.assertEqual(keys, sorted(keys, reverse=ordering[0].startswith('-')))
+
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor([150, "abc"], 3, ('price', 'uid'))
+        self.assertEqual(decode_cursor(cursor, ordering=('price', 'uid')), ([150, "abc"], 3))
+
+    def test_tampered_cursors_are_rejected(self):
+        paginator = self.paginator(('price', 'uid'))
+        cursor = paginator.page().next_cursor
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["v"]
+        tampered = {
+            "not base64": "%%%",
+            "not json": base64.urlsafe_b64encode(b"nope").decode(),
+            "no values": raw_cursor({"n": 1, "o": "price,uid"}),
+            "values not a list": raw_cursor({"v": "150", "n": 1, "o": "price,uid"}),
+            "too few values": raw_cursor({"v": values[:1], "n": 1, "o": "price,uid"}),
+            "too many values": raw_cursor({"v": values + [1], "n": 1, "o": "price,uid"}),
+            "wrong type": raw_cursor({"v": ["cheap", values[1]], "n": 1, "o": "price,uid"}),
+            "bad uid": raw_cursor({"v": [values[0], "not-a-uuid"], "n": 1, "o": "price,uid"}),
+            "null": raw_cursor({"v": [None, values[1]], "n": 1, "o": "price,uid"}),
+            "bad number": raw_cursor({"v": values, "n": "one", "o": "price,uid"}),
+            "no ordering": raw_cursor({"v": values, "n": 1}),
+            "other ordering": self.paginator(('product_name', 'uid')).page().next_cursor,
+            "reversed ordering": self.paginator(('-price', '-uid')).page().next_cursor,
+        }
+        for name, cursor in tampered.items():
+            with self.subTest(name):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(after=cursor)
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(before=cursor)
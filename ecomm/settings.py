@@ -109,6 +109,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.request',
+                'accounts.context_processors.navbar_badges',
             ],
         },
     },
@@ -125,7 +126,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Take the write lock when a transaction starts so concurrent checkouts
+        # queue for it instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+    # Activity tracking (see DATABASE_ROUTES below); created with
+    # "python manage.py migrate --database activity". Activity recorded before
+    # the route existed is still in the default database until it is moved
+    # over, once, with "python manage.py move_activity_rows".
+    'activity': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'activity.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    },
+}
+
+# Tables written on every request are kept out of the main database so they
+# never contend with checkout for its write lock (see base/routers.py). Add
+# 'sessions.session': 'activity' to move database sessions there as well.
+DATABASE_ROUTERS = ['base.routers.ModelDatabaseRouter']
+DATABASE_ROUTES = {
+    'accounts.useractivity': 'activity',
+    'accounts.activityrollup': 'activity',
 }
 
 
@@ -156,6 +184,45 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "public/media")
 
+# Rendered invoice PDFs (see accounts/invoices.py); kept outside MEDIA_ROOT
+# because invoices must only be served to their owner.
+INVOICE_CACHE_DIR = BASE_DIR / "invoice_cache"
+INVOICE_RENDER_WORKERS = 2
+
+# Shared by every worker, as the version stamps in base/cache.py and the
+# cached badges, facets, fragments and coupons must be: Redis when REDIS_URL
+# is set (needs the redis package), otherwise files that all workers on this
+# host share.
+REDIS_URL = config("REDIS_URL", default=None)
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+# Activity tracking writes in batches from a background thread (see
+# accounts/activity.py); rows beyond the queue size are dropped.
+ACTIVITY_QUEUE_SIZE = 10000
+ACTIVITY_BATCH_SIZE = 200
+ACTIVITY_FLUSH_INTERVAL = 1.0
+
+# Activity older than ACTIVITY_RETENTION_DAYS is moved by the archive_activity
+# command into gzipped JSONL files, one per day (see accounts/archive.py).
+ACTIVITY_RETENTION_DAYS = 30
+ACTIVITY_ARCHIVE_DIR = BASE_DIR / "activity_archive"
+# Per-minute activity rollups are pruned by the same command after this long.
+ACTIVITY_MINUTE_ROLLUP_DAYS = 7
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
@@ -0,0 +1,168 @@
+import os
+import sys
+import json
+import subprocess
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Boots a fresh interpreter the way a web worker does (django.setup() for all
+# INSTALLED_APPS, the WSGI handler with its middleware, then the URLconf with
+# every view module) and reports where the time and memory went. Two runs are
+# made: one under -X importtime for per-module timings and RSS, one under
+# tracemalloc for allocations, since tracing slows imports down severalfold.
+MARKER = "@@startup_profile@@"
+
+BOOT_SCRIPT = """
+import json, os, sys, time, resource
+tracing = os.environ.get("STARTUP_PROFILE_TRACEMALLOC") == "1"
+if tracing:
+    import tracemalloc
+    tracemalloc.start(4)
+phases = []
+mark = time.perf_counter()
+
+def phase(name):
+    global mark
+    now = time.perf_counter()
+    phases.append((name, now - mark))
+    mark = now
+
+import django
+phase("import django")
+django.setup()
+phase("django.setup() (INSTALLED_APPS)")
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+phase("WSGI handler and middleware")
+error = None
+try:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+except Exception as e:
+    error = type(e).__name__ + ": " + str(e)
+phase("URLconf and views")
+
+result = {
+    "phases": phases,
+    "total": sum(seconds for _, seconds in phases),
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": len(sys.modules),
+    "error": error,
+}
+if tracing:
+    files = {}
+    for stat in tracemalloc.take_snapshot().statistics("traceback"):
+        # Charge each block to the innermost frame outside the import machinery.
+        frame = next((f for f in stat.traceback if not f.filename.startswith("<frozen")), stat.traceback[0])
+        files[frame.filename] = files.get(frame.filename, 0) + stat.size
+    result["files"] = files
+    result["traced_peak"] = tracemalloc.get_traced_memory()[1]
+print(os.environ["STARTUP_PROFILE_MARKER"] + json.dumps(result))
+"""
+
+
+def _package(filename):
+    """Map a source path to a top-level package name."""
+    if filename.startswith("<"):
+        return "<import machinery, incl. code objects>"
+    path = os.path.abspath(filename)
+    base = str(settings.BASE_DIR)
+    if path.startswith(base + os.sep):
+        return os.path.relpath(path, base).split(os.sep)[0]
+    for root in sorted((p for p in sys.path if p), key=len, reverse=True):
+        root = os.path.abspath(root)
+        if path.startswith(root + os.sep):
+            return os.path.relpath(path, root).split(os.sep)[0].removesuffix(".py")
+    return os.path.basename(path)
+
+
+class Command(BaseCommand):
+    help = "Profile worker boot: per-module import time, memory by package, boot time and RSS."
+    # The boot under test runs in a subprocess; checks here would import the URLconf early.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help="Rows to show in each table.")
+        parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc run.")
+        parser.add_argument('--save-baseline', metavar='FILE', help="Write boot time and RSS to FILE.")
+        parser.add_argument('--baseline', metavar='FILE', help="Compare against a saved baseline.")
+        parser.add_argument('--max-regression', type=float, default=None, metavar='PERCENT',
+                            help="With --baseline, fail if boot time or RSS grew by more than PERCENT.")
+
+    def _boot(self, *flags, tracemalloc=False):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+                   PYTHONPATH=os.pathsep.join(p for p in sys.path if p), STARTUP_PROFILE_MARKER=MARKER)
+        if tracemalloc:
+            env["STARTUP_PROFILE_TRACEMALLOC"] = "1"
+        process = subprocess.run(
+            [sys.executable, *flags, "-c", BOOT_SCRIPT],
+            capture_output=True, text=True, env=env, cwd=str(settings.BASE_DIR))
+        for line in process.stdout.splitlines():
+            if line.startswith(MARKER):
+                return json.loads(line[len(MARKER):]), process.stderr
+        raise CommandError(f"Boot failed:\n{process.stderr[-2000:]}")
+
+    def _import_times(self, stderr):
+        # Lines look like "import time:  self [us] | cumulative | imported package".
+        modules = []
+        for line in stderr.splitlines():
+            if not line.startswith("import time:") or "imported package" in line:
+                continue
+            own, cumulative, name = line[len("import time:"):].split("|")
+            modules.append((name.strip(), int(own), int(cumulative)))
+        return modules
+
+    def handle(self, *args, **options):
+        top = options['top']
+        result, stderr = self._boot("-X", "importtime")
+        modules = self._import_times(stderr)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Boot phases"))
+        for name, seconds in result['phases']:
+            self.stdout.write(f"  {seconds * 1000:9.1f} ms  {name}")
+        self.stdout.write(
+            f"  {result['total'] * 1000:9.1f} ms  total, {result['modules']} modules, "
+            f"max RSS {result['max_rss_kb'] / 1024:.1f} MiB")
+        if result['error']:
+            self.stdout.write(self.style.WARNING(f"  URLconf failed to load: {result['error']}"))
+
+        packages = defaultdict(int)
+        for name, own, _ in modules:
+            packages[name.lstrip().split(".")[0]] += own
+        self.stdout.write(self.style.MIGRATE_HEADING("Import time by top-level package"))
+        for package, micros in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {micros / 1000:9.1f} ms  {package}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Slowest modules (cumulative, includes their imports)"))
+        for name, _, cumulative in sorted(modules, key=lambda module: -module[2])[:top]:
+            self.stdout.write(f"  {cumulative / 1000:9.1f} ms  {name.strip()}")
+
+        if not options['no_memory']:
+            traced, _ = self._boot(tracemalloc=True)
+            memory = defaultdict(int)
+            for filename, size in traced['files'].items():
+                memory[_package(filename)] += size
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"Memory allocated by package (traced peak {traced['traced_peak'] / 1024 / 1024:.1f} MiB)"))
+            for package, size in sorted(memory.items(), key=lambda item: -item[1])[:top]:
+                self.stdout.write(f"  {size / 1024:9.0f} KiB  {package}")
+
+        summary = {"boot_ms": round(result['total'] * 1000, 1), "max_rss_kb": result['max_rss_kb']}
+        if options['save_baseline']:
+            with open(options['save_baseline'], "w") as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {options['save_baseline']}."))
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            self.stdout.write(self.style.MIGRATE_HEADING("Against baseline"))
+            regressed = []
+            for key, label in (("boot_ms", "boot time (ms)"), ("max_rss_kb", "max RSS (KiB)")):
+                change = (summary[key] - baseline[key]) / baseline[key] * 100 if baseline[key] else 0.0
+                self.stdout.write(f"  {label}: {baseline[key]} -> {summary[key]} ({change:+.1f}%)")
+                if options['max_regression'] is not None and change > options['max_regression']:
+                    regressed.append(label)
+            if regressed:
+                raise CommandError(f"Regressed beyond {options['max_regression']}%: {', '.join(regressed)}")
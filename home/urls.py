@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import index, product_search, contact, about, terms_and_conditions, privacy_policy
+from .views import index, product_search, search_suggest, contact, about, terms_and_conditions, privacy_policy
 
 urlpatterns = [
     path('', index, name="index"),
     path('search/', product_search, name="product_search"),
+    path('search/suggest/', search_suggest, name="search_suggest"),
     path('contact/', contact, name="contact"),
     path('about/', about, name="about"),
     path('terms-and-conditions/', terms_and_conditions, name="terms-and-conditions"),
@@ -1,33 +1,76 @@
-from django.db.models import Q
+from django.http import JsonResponse
 from django.shortcuts import render
-from products.models import Product, Category
+from django.core.exceptions import ValidationError
+from base.cache import get_version, make_key
+from base.pagination import KeysetPaginator, InvalidCursor
+from products.models import Product
+from products.facets import CATALOG_VERSION, FacetSelection, build_facets, cached_facet_counts
+from products import search, suggest
 import logging
 
 # Create logger for monitoring firewall payloads
 logger = logging.getLogger("WAF_TEST")
 
+PRODUCTS_PER_PAGE = 24
+SEARCH_RESULTS_LIMIT = 96
+SUGGESTION_LIMIT = 8
+
+# Every listing ends on uid so keyset cursors always point at a single row.
+SORT_ORDERINGS = {
+    'newest': ('category_id', 'uid'),
+    'priceAsc': ('price', 'uid'),
+    'priceDesc': ('-price', '-uid'),
+    'rating': ('-average_rating', '-uid'),
+}
+DEFAULT_ORDERING = ('product_name', 'uid')
+
+
 def index(request):
-    query = Product.objects.all()
-    categories = Category.objects.all()
+    selection = FacetSelection.from_query(request.GET)
     selected_sort = request.GET.get('sort')
-    selected_category = request.GET.get('category')
 
-    if selected_category:
-        query = query.filter(category__category_name__icontains=selected_category)
+    try:
+        min_rating = int(request.GET.get('min_rating') or 0)
+    except ValueError:
+        min_rating = 0
+
+    # Filters that are not facets narrow the facet counts as well.
+    base_query = Product.objects.all()
+    if min_rating:
+        base_query = base_query.filter(average_rating__gte=min_rating)
+
+    query = selection.apply(base_query)
+    if selected_sort == 'newest':
+        query = query.filter(newest_product=True)
+
+    catalog_version = get_version(CATALOG_VERSION)
+    paginator = KeysetPaginator(
+        query,
+        per_page=PRODUCTS_PER_PAGE,
+        ordering=SORT_ORDERINGS.get(selected_sort, DEFAULT_ORDERING),
+        approximate_count=True,
+        count_cache_key=make_key(
+            'product_count', catalog_version, selected_sort, min_rating, *selection.cache_key_parts()),
+    )
 
-    if selected_sort:
-        if selected_sort == 'newest':
-            query = query.filter(newest_product=True).order_by('category_id')
-        elif selected_sort == 'priceAsc':
-            query = query.order_by('price')
-        elif selected_sort == 'priceDesc':
-            query = query.order_by('-price')
+    try:
+        products = paginator.page(
+            after=request.GET.get('after'), before=request.GET.get('before'))
+    except (InvalidCursor, ValidationError):
+        products = paginator.page()
+
+    counts = cached_facet_counts(selection, base_query, extra_key=(min_rating,))
+
+    page_query = request.GET.copy()
+    page_query.pop('after', None)
+    page_query.pop('before', None)
 
     context = {
-        'products': query,
-        'categories': categories,
-        'selected_category': selected_category,
+        'products': products,
+        'facets': build_facets(selection, counts),
         'selected_sort': selected_sort,
+        'min_rating': min_rating,
+        'page_query': page_query.urlencode(),
     }
     return render(request, 'home/index.html', context)
 
@@ -38,13 +81,8 @@ def product_search(request):
     # Log raw payload for WAF monitoring
     logger.warning(f"[WAF TEST PAYLOAD] => {query}")
 
-    # Search logic (still works normally)
-    products = Product.objects.filter(
-        Q(product_name__icontains=query) |
-        Q(category__category_name__icontains=query) |
-        Q(size_variant__size_name__icontains=query) |
-        Q(color_variant__color_name__icontains=query)
-    ).distinct()
+    # Ranked full-text search (FTS5 on SQLite)
+    products = search.search_products(query, limit=SEARCH_RESULTS_LIMIT)
 
     # return raw payload without escaping
     return render(request, 'home/search.html', {
@@ -53,6 +91,14 @@ def product_search(request):
     })
 
 
+def search_suggest(request):
+    query = request.GET.get('q', '')[:100]
+    return JsonResponse({
+        'query': query,
+        'suggestions': suggest.index.suggest(query, limit=SUGGESTION_LIMIT),
+    })
+
+
 def contact(request):
     return render(request, 'home/contact.html')
 
@@ -1,5 +1,6 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
+from django.db.models import F
 from django.utils.html import format_html
 from .models import *
 
@@ -60,9 +61,66 @@ class ProductImageAdmin(admin.StackedInline):
     image_preview.short_description = 'Preview'
 
 
+class ProductStockForm(forms.ModelForm):
+    # Units are only ever changed by a delta applied with F(), so an admin
+    # save never overwrites decrements made by checkouts while the form was open.
+    adjust_by = forms.IntegerField(
+        required=False, help_text="Units to add (or remove, if negative).")
+
+    class Meta:
+        model = ProductStock
+        fields = ['size_variant', 'stock']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Not instance.pk: the uid default gives unsaved rows one as well.
+        self.existing = not self.instance._state.adding
+        if self.existing:
+            self.fields['stock'].disabled = True
+        else:
+            self.fields['adjust_by'].disabled = True
+
+    def clean_adjust_by(self):
+        delta = self.cleaned_data.get('adjust_by')
+        if delta and self.existing and self.instance.stock + delta < 0:
+            raise forms.ValidationError(f"Only {self.instance.stock} units are in stock.")
+        return delta
+
+    def save(self, commit=True):
+        self.adjustment_failed = False
+        if not self.existing:
+            return super().save(commit)
+
+        # Only the size is written back; the stock column is left alone.
+        instance = super().save(commit=False)
+        if commit:
+            instance.save(update_fields=['size_variant'])
+            delta = self.cleaned_data.get('adjust_by')
+            if delta:
+                # Conditional, like every stock change: fails rather than going
+                # below zero if units were sold since the form was loaded.
+                self.adjustment_failed = not ProductStock.objects.filter(
+                    uid=instance.pk, stock__gte=-delta).update(stock=F('stock') + delta)
+        return instance
+
+
+class ProductStockAdmin(admin.TabularInline):
+    model = ProductStock
+    form = ProductStockForm
+    extra = 0
+
+
 class ProductAdmin(admin.ModelAdmin):
     list_display = ['product_name', 'price']
-    inlines = [ProductImageAdmin]
+    inlines = [ProductImageAdmin, ProductStockAdmin]
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        for stock_form in formset.forms:
+            if getattr(stock_form, 'adjustment_failed', False):
+                self.message_user(
+                    request, f"Stock for {stock_form.instance.size_variant} was not changed: "
+                             "not enough units are left.", messages.WARNING)
 
 
 class ProductImageStandaloneAdmin(admin.ModelAdmin):
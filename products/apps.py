@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
 
 
 class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
+
+    def ready(self):
+        import products.signals
+        from products.suggest import index
+        # Not built here: ready() also runs for management commands, and a
+        # server that forks after loading the app would not carry the thread
+        # into its workers. Each worker starts the build on its first request.
+        request_started.connect(index.warm, dispatch_uid='products.suggest.warm')
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from base.cache import get_version, bump_version, make_key
+from products.models import Coupon
+
+# The active (unexpired) coupons, held in the cache as one small dict keyed by
+# code so that validating a code costs no query. products.signals bumps the
+# version on every Coupon save or delete, once the change commits, which
+# orphans the cached table. The cache only answers lookups: a coupon is read
+# again with confirm() before it is applied, so a copy cached just before it
+# was expired or had its minimum raised is never attached to a cart.
+COUPON_VERSION = 'coupons'
+COUPON_CACHE_TIMEOUT = 60 * 60
+
+
+def active_coupons():
+    key = make_key('active_coupons', get_version(COUPON_VERSION))
+    coupons = cache.get(key)
+    if coupons is None:
+        coupons = {coupon.coupon_code: coupon for coupon in Coupon.objects.filter(is_expired=False)}
+        cache.set(key, coupons, COUPON_CACHE_TIMEOUT)
+    return coupons
+
+
+def get_active_coupon(code):
+    return active_coupons().get((code or '').strip())
+
+
+def confirm(coupon):
+    """``coupon`` as it is in the database now, or None if it has since
+    been expired or deleted."""
+    return Coupon.objects.filter(uid=coupon.uid, is_expired=False).first()
+
+
+def invalidate():
+    bump_version(COUPON_VERSION)
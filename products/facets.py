@@ -0,0 +1,165 @@
+from django.core.cache import cache
+from django.db.models import Count, Exists, OuterRef, Q
+from base.cache import get_version, make_key
+from products.models import Product
+from products.reference import reference_data
+
+# Faceted filtering for the home listing. Every facet count is computed in a
+# single aggregate query with one conditional COUNT per facet value; each
+# count applies every selected filter except its own facet's, so picking a
+# size still shows how many products the other sizes would add. Results are
+# cached per filter combination under the catalog version, which
+# products.signals bumps on every catalog write.
+CATALOG_VERSION = 'catalog'
+FACET_CACHE_TIMEOUT = 300
+
+PRICE_RANGES = (
+    ('0-999', 'Under ₹1000', 0, 999),
+    ('1000-2499', '₹1000 - ₹2499', 1000, 2499),
+    ('2500-4999', '₹2500 - ₹4999', 2500, 4999),
+    ('5000-', '₹5000 & above', 5000, None),
+)
+
+
+def price_q(price):
+    _, _, low, high = price
+    q = Q(price__gte=low)
+    if high is not None:
+        q &= Q(price__lte=high)
+    return q
+
+
+class FacetSelection:
+
+    def __init__(self, categories=(), sizes=(), colors=(), price=None, newest=False):
+        self.categories = list(categories)
+        self.sizes = list(sizes)
+        self.colors = list(colors)
+        self.price = price
+        self.newest = newest
+
+    @classmethod
+    def from_query(cls, params):
+        """Build a selection from request.GET, ignoring unknown values."""
+        categories = [reference_data.category_by_slug(slug) for slug in params.getlist('category')]
+        sizes = [reference_data.size_by_name(name) for name in params.getlist('size')]
+        colors = [reference_data.color_by_name(name) for name in params.getlist('color')]
+        price = next((entry for entry in PRICE_RANGES if entry[0] == params.get('price')), None)
+        return cls(
+            categories=[category for category in categories if category],
+            sizes=[size for size in sizes if size],
+            colors=[color for color in colors if color],
+            price=price,
+            newest=params.get('newest') == '1',
+        )
+
+    def cache_key_parts(self):
+        return (
+            sorted(category.slug for category in self.categories),
+            sorted(size.size_name for size in self.sizes),
+            sorted(color.color_name for color in self.colors),
+            self.price[0] if self.price else '',
+            self.newest,
+        )
+
+    def q(self, exclude=None):
+        """Filters as join-based Q objects, for use inside facet aggregates."""
+        q = Q()
+        if self.categories and exclude != 'category':
+            q &= Q(category_id__in=[category.uid for category in self.categories])
+        if self.sizes and exclude != 'size':
+            q &= Q(size_variant__in=[size.uid for size in self.sizes])
+        if self.colors and exclude != 'color':
+            q &= Q(color_variant__in=[color.uid for color in self.colors])
+        if self.price and exclude != 'price':
+            q &= price_q(self.price)
+        if self.newest and exclude != 'newest':
+            q &= Q(newest_product=True)
+        return q
+
+    def apply(self, queryset):
+        """Filter a Product queryset using exact lookups and EXISTS for M2M facets,
+        so the listing never needs DISTINCT."""
+        if self.categories:
+            queryset = queryset.filter(category_id__in=[category.uid for category in self.categories])
+        if self.sizes:
+            queryset = queryset.filter(Exists(Product.size_variant.through.objects.filter(
+                product_id=OuterRef('uid'), sizevariant_id__in=[size.uid for size in self.sizes])))
+        if self.colors:
+            queryset = queryset.filter(Exists(Product.color_variant.through.objects.filter(
+                product_id=OuterRef('uid'), colorvariant_id__in=[color.uid for color in self.colors])))
+        if self.price:
+            queryset = queryset.filter(price_q(self.price))
+        if self.newest:
+            queryset = queryset.filter(newest_product=True)
+        return queryset
+
+
+def _count(condition):
+    return Count('uid', distinct=True, filter=condition)
+
+
+def facet_counts(selection, queryset=None):
+    """Return ``{facet: {value: count}}`` for every facet value in one query."""
+    if queryset is None:
+        queryset = Product.objects.all()
+
+    aggregates = {}
+    for category in reference_data.categories():
+        aggregates[f'category:{category.slug}'] = _count(
+            Q(category_id=category.uid) & selection.q(exclude='category'))
+    for size in reference_data.sizes():
+        aggregates[f'size:{size.size_name}'] = _count(
+            Q(size_variant=size.uid) & selection.q(exclude='size'))
+    for color in reference_data.colors():
+        aggregates[f'color:{color.color_name}'] = _count(
+            Q(color_variant=color.uid) & selection.q(exclude='color'))
+    for price in PRICE_RANGES:
+        aggregates[f'price:{price[0]}'] = _count(price_q(price) & selection.q(exclude='price'))
+    aggregates['newest:1'] = _count(Q(newest_product=True) & selection.q(exclude='newest'))
+
+    # Aggregate aliases must be identifiers, so map them to positions.
+    aliases = {f'facet_{position}': name for position, name in enumerate(aggregates)}
+    row = queryset.aggregate(**{
+        alias: aggregates[name] for alias, name in aliases.items()})
+
+    counts = {'category': {}, 'size': {}, 'color': {}, 'price': {}, 'newest': {}}
+    for alias, name in aliases.items():
+        facet, value = name.split(':', 1)
+        counts[facet][value] = row[alias]
+    return counts
+
+
+def cached_facet_counts(selection, queryset=None, extra_key=()):
+    key = make_key('facets', get_version(CATALOG_VERSION), *selection.cache_key_parts(), *extra_key)
+    counts = cache.get(key)
+    if counts is None:
+        counts = facet_counts(selection, queryset)
+        cache.set(key, counts, FACET_CACHE_TIMEOUT)
+    return counts
+
+
+def build_facets(selection, counts):
+    """Pair each facet value with its count and selected state for templates."""
+    selected_categories = {category.slug for category in selection.categories}
+    selected_sizes = {size.size_name for size in selection.sizes}
+    selected_colors = {color.color_name for color in selection.colors}
+    return {
+        'categories': [
+            (category, counts['category'].get(category.slug, 0), category.slug in selected_categories)
+            for category in reference_data.categories()
+        ],
+        'sizes': [
+            (size, counts['size'].get(size.size_name, 0), size.size_name in selected_sizes)
+            for size in reference_data.sizes()
+        ],
+        'colors': [
+            (color, counts['color'].get(color.color_name, 0), color.color_name in selected_colors)
+            for color in reference_data.colors()
+        ],
+        'prices': [
+            (key, label, counts['price'].get(key, 0), bool(selection.price) and selection.price[0] == key)
+            for key, label, _, _ in PRICE_RANGES
+        ],
+        'newest': (counts['newest'].get('1', 0), selection.newest),
+    }
@@ -0,0 +1,25 @@
+from base.cache import get_version, bump_version
+from products.reference import VERSION_NAME as REFERENCE_VERSION
+
+# Versioned fragment caching for the product detail page. The parts of
+# product/product.html that show only this product are cached under its page
+# version (plus the reference-data version, since sizes, colors and the
+# category name render into it); related products are rendered fresh.
+# products.signals bumps the product version on any change to the product,
+# its images, reviews, review votes or variant links, so fragments are never
+# deleted, only left behind to expire. Bumps happen on commit (see
+# base.cache), so a page rendered during a write never caches the old
+# product under the new version.
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def _name(product_id):
+    return f"product_page:{product_id}"
+
+
+def page_version(product_id):
+    return f"{get_version(_name(product_id))}.{get_version(REFERENCE_VERSION)}"
+
+
+def bump_page_version(product_id):
+    bump_version(_name(product_id))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from products import search
+
+
+class Command(BaseCommand):
+    help = "Drop and repopulate the SQLite FTS5 product search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_enabled():
+            self.stdout.write(self.style.WARNING("Full-text search index is only used on SQLite; nothing to do."))
+            return
+
+        indexed = search.rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} products."))
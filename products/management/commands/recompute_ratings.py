@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from base.cache import bump_version
+from products.facets import CATALOG_VERSION
+from products import related
+from products.models import Category, Product, recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Recompute Product review_count / star_sum / average_rating from ProductReview rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_uid = None
+        updated = 0
+
+        while True:
+            products = Product.objects.order_by('uid')
+            if last_uid is not None:
+                products = products.filter(uid__gt=last_uid)
+            uids = list(products.values_list('uid', flat=True)[:chunk_size])
+            if not uids:
+                break
+
+            updated += recompute_ratings(uids)
+            last_uid = uids[-1]
+
+        # Rating-filtered facet counts and listings are cached per catalog
+        # version; related product pools are ordered by rating.
+        bump_version(CATALOG_VERSION)
+        for category_id in Category.objects.values_list('uid', flat=True):
+            related.schedule_refresh(category_id)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {updated} products."))
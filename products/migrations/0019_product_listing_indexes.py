@@ -0,0 +1,25 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0018_alter_coupon_coupon_code'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'uid'], name='product_price_uid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_name', 'uid'], name='product_name_uid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['newest_product', 'category', 'uid'], name='product_newest_idx'),
+        ),
+    ]
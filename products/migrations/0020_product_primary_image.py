@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+def populate_primary_image(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    ProductImage = apps.get_model('products', 'ProductImage')
+    for product in Product.objects.all().iterator():
+        product.primary_image_url = ProductImage.objects.filter(
+            product=product).order_by('order', 'updated_at').values_list('image_url', flat=True).first()
+        product.save(update_fields=['primary_image_url'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0019_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productimage',
+            options={'ordering': ['order', 'updated_at']},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='primary_image_url',
+            field=models.URLField(blank=True, editable=False, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='productimage',
+            name='order',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_primary_image, migrations.RunPython.noop),
+    ]
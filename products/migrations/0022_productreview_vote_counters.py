@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:58
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_vote_counters(apps, schema_editor):
+    ProductReview = apps.get_model('products', 'ProductReview')
+    reviews = ProductReview.objects.annotate(
+        like_total=Count('likes', distinct=True), dislike_total=Count('dislikes', distinct=True))
+    for review in reviews.iterator():
+        review.likes_count = review.like_total
+        review.dislikes_count = review.dislike_total
+        review.save(update_fields=['likes_count', 'dislikes_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0021_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productreview',
+            name='dislikes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='productreview',
+            name='likes_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_vote_counters, migrations.RunPython.noop),
+    ]
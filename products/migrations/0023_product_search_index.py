@@ -0,0 +1,54 @@
+from django.db import migrations
+
+SEARCH_TABLE = 'products_product_search'
+ROWID_MASK = (1 << 63) - 1
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+
+    Product = apps.get_model('products', 'Product')
+    schema_editor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+            uid UNINDEXED, product_name, description, category, sizes, colors,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    products = Product.objects.select_related('category').prefetch_related('size_variant', 'color_variant')
+    documents = [
+        (
+            product.uid.int & ROWID_MASK,
+            product.uid.hex,
+            product.product_name,
+            product.product_desription,
+            product.category.category_name,
+            ' '.join(size.size_name for size in product.size_variant.all()),
+            ' '.join(color.color_name for color in product.color_variant.all()),
+        )
+        for product in products
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, uid, product_name, description, category, sizes, colors) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            documents,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0022_productreview_vote_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0023_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', '-average_rating'], name='product_category_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:14
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0024_product_category_rating_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('uid', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now=True)),
+                ('updated_at', models.DateTimeField(auto_now_add=True)),
+                ('stock', models.IntegerField(default=0)),
+                ('color_variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='products.colorvariant')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='products.product')),
+                ('size_variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock', to='products.sizevariant')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(('stock__gte', 0)), name='product_stock_not_negative'), models.UniqueConstraint(condition=models.Q(('color_variant__isnull', False)), fields=('product', 'size_variant', 'color_variant'), name='unique_product_stock_color'), models.UniqueConstraint(condition=models.Q(('color_variant__isnull', True)), fields=('product', 'size_variant'), name='unique_product_stock_no_color')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-18 10:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_colors(apps, schema_editor):
+    ProductStock = apps.get_model('products', 'ProductStock')
+    StockReservation = apps.get_model('accounts', 'StockReservation')
+
+    # Fold every (product, size)'s rows into one, preferring the row without a
+    # color, summing the units and moving the holds on the other rows over.
+    groups = (ProductStock.objects.values('product', 'size_variant')
+              .annotate(rows=Count('uid')).filter(rows__gt=1))
+    for group in groups:
+        rows = list(ProductStock.objects.filter(
+            product_id=group['product'], size_variant_id=group['size_variant'])
+            .order_by('created_at'))
+        rows.sort(key=lambda row: row.color_variant_id is not None)
+        keep, extra = rows[0], rows[1:]
+        keep.stock = sum(row.stock for row in rows)
+        keep.save(update_fields=['stock'])
+
+        for hold in StockReservation.objects.filter(stock_id__in=[row.uid for row in extra]):
+            existing = StockReservation.objects.filter(cart_id=hold.cart_id, stock_id=keep.uid).first()
+            if existing and hold.cart_id is not None:
+                existing.quantity += hold.quantity
+                existing.expires_at = max(existing.expires_at, hold.expires_at)
+                existing.save(update_fields=['quantity', 'expires_at'])
+                hold.delete()
+            else:
+                hold.stock_id = keep.uid
+                hold.save(update_fields=['stock'])
+        ProductStock.objects.filter(uid__in=[row.uid for row in extra]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0025_productstock'),
+        ('accounts', '0019_stockreservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_colors, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='productstock',
+            name='unique_product_stock_color',
+        ),
+        migrations.RemoveConstraint(
+            model_name='productstock',
+            name='unique_product_stock_no_color',
+        ),
+        migrations.RemoveField(
+            model_name='productstock',
+            name='color_variant',
+        ),
+        migrations.AddConstraint(
+            model_name='productstock',
+            constraint=models.UniqueConstraint(fields=('product', 'size_variant'), name='unique_product_stock'),
+        ),
+    ]
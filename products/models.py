@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.functions import Cast
 from base.models import BaseModel
 from django.utils.text import slugify
 from django.utils.html import mark_safe
@@ -51,6 +53,31 @@ class Product(BaseModel):
     color_variant = models.ManyToManyField(ColorVariant, blank=True)
     size_variant = models.ManyToManyField(SizeVariant, blank=True)
     newest_product = models.BooleanField(default=False)
+    # Denormalized copy of the first ProductImage (by ``order``), kept in sync
+    # by products.signals so grids never query product_images per card.
+    primary_image_url = models.URLField(
+        max_length=500, blank=True, null=True, editable=False)
+    # Rating aggregates, maintained incrementally by products.signals and
+    # repaired by the ``recompute_ratings`` management command.
+    review_count = models.IntegerField(default=0, editable=False)
+    star_sum = models.IntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['average_rating', 'uid'], name='product_rating_uid_idx'),
+            models.Index(fields=['category', '-average_rating'], name='product_category_rating_idx'),
+            models.Index(fields=['price', 'uid'], name='product_price_uid_idx'),
+            models.Index(fields=['product_name', 'uid'], name='product_name_uid_idx'),
+            models.Index(fields=['newest_product', 'category', 'uid'], name='product_newest_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the category so a move can refresh the old category's related pool.
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.product_name)
@@ -66,10 +93,54 @@ class Product(BaseModel):
         return self.price
 
     def get_rating(self):
-        total = sum(int(review.stars) for review in self.reviews.all())
-        if self.reviews.count() > 0:
-            return total / self.reviews.count()
-        return 0
+        return self.average_rating
+
+    def get_rating_percentage(self):
+        return (self.average_rating / 5) * 100
+
+
+
+def sync_primary_image(product_id):
+    primary = ProductImage.objects.filter(
+        product_id=product_id).values_list('image_url', flat=True).first()
+    Product.objects.filter(uid=product_id).update(primary_image_url=primary)
+    return primary
+
+
+def apply_review_delta(product_id, count_delta, star_delta):
+    """Shift a product's rating aggregates in one UPDATE statement.
+
+    All right-hand sides read the pre-update row, so the new average is
+    derived from the same snapshot as the new count and sum.
+    """
+    new_count = F('review_count') + count_delta
+    new_sum = F('star_sum') + star_delta
+    Product.objects.filter(uid=product_id).update(
+        review_count=new_count,
+        star_sum=new_sum,
+        average_rating=Case(
+            When(review_count__lte=-count_delta, then=0.0),
+            default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def recompute_ratings(product_ids):
+    """Rebuild the rating aggregates of ``product_ids`` from their reviews."""
+    totals = {
+        row['product_id']: row
+        for row in ProductReview.objects.filter(product_id__in=product_ids)
+        .values('product_id').annotate(count=Count('uid'), total=Sum('stars'))
+    }
+    products = list(Product.objects.filter(uid__in=product_ids).only('uid'))
+    for product in products:
+        row = totals.get(product.uid, {'count': 0, 'total': 0})
+        product.review_count = row['count']
+        product.star_sum = row['total'] or 0
+        product.average_rating = product.star_sum / product.review_count if product.review_count else 0
+    Product.objects.bulk_update(products, ['review_count', 'star_sum', 'average_rating'])
+    return len(products)
 
 
 class ProductImage(BaseModel):
@@ -77,6 +148,10 @@ class ProductImage(BaseModel):
         Product, on_delete=models.CASCADE, related_name='product_images')
     image_url = models.URLField(
         max_length=500, default='https://via.placeholder.com/500')
+    order = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['order', 'updated_at']
 
     def img_preview(self):
         return mark_safe(f'<img src="{self.image_url}" width="200"/>')
@@ -85,6 +160,27 @@ class ProductImage(BaseModel):
         return f"Image for {self.product.product_name}"
 
 
+class ProductStock(BaseModel):
+    """Units on hand for one size of a product. Items without a stock row are
+    not tracked and can always be sold. Stock is per size only, because that
+    is all a cart line records; change it with F() updates (see
+    accounts.inventory), never by saving an absolute value read earlier."""
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name='stock')
+    size_variant = models.ForeignKey(
+        SizeVariant, on_delete=models.CASCADE, related_name='stock')
+    stock = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(stock__gte=0), name='product_stock_not_negative'),
+            models.UniqueConstraint(fields=['product', 'size_variant'], name='unique_product_stock'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.product_name} - {self.size_variant.size_name}: {self.stock}"
+
+
 class Coupon(BaseModel):
     coupon_code = models.CharField(max_length=10, unique=True)
     is_expired = models.BooleanField(default=False)
@@ -108,12 +204,54 @@ class ProductReview(BaseModel):
         User, related_name="liked_reviews", blank=True)
     dislikes = models.ManyToManyField(
         User, related_name="disliked_reviews", blank=True)
+    likes_count = models.IntegerField(default=0, editable=False)
+    dislikes_count = models.IntegerField(default=0, editable=False)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this review contributed to its product's aggregates.
+        instance._loaded_rating = (
+            instance.__dict__.get('product_id'), instance.__dict__.get('stars'))
+        return instance
 
     def like_count(self):
-        return self.likes.count()
+        return self.likes_count
 
     def dislike_count(self):
-        return self.dislikes.count()
+        return self.dislikes_count
+
+    def toggle_vote(self, user, like=True):
+        """Toggle ``user``'s like (or dislike) and return ``(likes, dislikes)``.
+
+        Membership is tested by deleting through the unique (review, user)
+        index, and the counters move with F() updates, so no vote set is
+        ever loaded into Python.
+        """
+        votes, opposite = ProductReview.likes.through, ProductReview.dislikes.through
+        counter, opposite_counter = 'likes_count', 'dislikes_count'
+        if not like:
+            votes, opposite = opposite, votes
+            counter, opposite_counter = opposite_counter, counter
+
+        try:
+            with transaction.atomic():
+                removed, _ = votes.objects.filter(productreview_id=self.uid, user_id=user.id).delete()
+                if removed:
+                    changes = {counter: F(counter) - removed}
+                else:
+                    cleared, _ = opposite.objects.filter(
+                        productreview_id=self.uid, user_id=user.id).delete()
+                    votes.objects.create(productreview_id=self.uid, user_id=user.id)
+                    changes = {counter: F(counter) + 1, opposite_counter: F(opposite_counter) - cleared}
+                ProductReview.objects.filter(uid=self.uid).update(**changes)
+        except IntegrityError:
+            # A concurrent request cast the same vote first; report its result.
+            pass
+
+        self.likes_count, self.dislikes_count = ProductReview.objects.filter(
+            uid=self.uid).values_list('likes_count', 'dislikes_count').get()
+        return self.likes_count, self.dislikes_count
 
     def __str__(self):
         return f"{self.product.product_name} - {self.stars} Stars"
@@ -0,0 +1,112 @@
+import time
+import threading
+from base.cache import get_version, bump_version
+from django.db import transaction
+from django.http import Http404
+from products.models import Category, SizeVariant, ColorVariant
+
+# Process-local copy of the small reference tables (categories, sizes and
+# colors) that nearly every request reads. Writes bump a version number held
+# in the shared cache; each process compares it against its own copy at most
+# once per VERSION_CHECK_INTERVAL and reloads all three tables when it moved.
+VERSION_NAME = 'reference_data'
+VERSION_CHECK_INTERVAL = 1.0
+
+
+class ReferenceData:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._categories = []
+        self._categories_by_slug = {}
+        self._categories_by_uid = {}
+        self._sizes = []
+        self._sizes_by_name = {}
+        self._sizes_by_uid = {}
+        self._colors = []
+        self._colors_by_name = {}
+        self._colors_by_uid = {}
+
+    def _load(self, version):
+        categories = list(Category.objects.order_by('category_name'))
+        sizes = list(SizeVariant.objects.order_by('order', 'size_name'))
+        colors = list(ColorVariant.objects.order_by('color_name'))
+
+        self._categories = categories
+        self._categories_by_slug = {category.slug: category for category in categories}
+        self._categories_by_uid = {category.uid: category for category in categories}
+        self._sizes = sizes
+        self._sizes_by_name = {size.size_name: size for size in sizes}
+        self._sizes_by_uid = {size.uid: size for size in sizes}
+        self._colors = colors
+        self._colors_by_name = {color.color_name: color for color in colors}
+        self._colors_by_uid = {color.uid: color for color in colors}
+        self._version = version
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < VERSION_CHECK_INTERVAL:
+            return
+        with self._lock:
+            version = get_version(VERSION_NAME)
+            if version != self._version:
+                self._load(version)
+            self._checked_at = now
+
+    def _mark_stale(self):
+        with self._lock:
+            self._version = None
+
+    def invalidate(self):
+        """Mark every process's copy stale once the transaction commits;
+        called from products.signals."""
+        bump_version(VERSION_NAME)
+        transaction.on_commit(self._mark_stale)
+
+    def categories(self):
+        self._refresh()
+        return self._categories
+
+    def category_by_slug(self, slug):
+        self._refresh()
+        return self._categories_by_slug.get(slug)
+
+    def category(self, uid):
+        self._refresh()
+        return self._categories_by_uid.get(uid)
+
+    def sizes(self):
+        self._refresh()
+        return self._sizes
+
+    def size_by_name(self, size_name):
+        self._refresh()
+        return self._sizes_by_name.get(size_name)
+
+    def sizes_for(self, uids):
+        self._refresh()
+        return [size for size in self._sizes if size.uid in uids]
+
+    def colors(self):
+        self._refresh()
+        return self._colors
+
+    def color_by_name(self, color_name):
+        self._refresh()
+        return self._colors_by_name.get(color_name)
+
+    def colors_for(self, uids):
+        self._refresh()
+        return [color for color in self._colors if color.uid in uids]
+
+
+reference_data = ReferenceData()
+
+
+def get_size_or_404(size_name):
+    size_variant = reference_data.size_by_name(size_name)
+    if size_variant is None:
+        raise Http404("No SizeVariant matches the given query.")
+    return size_variant
@@ -0,0 +1,92 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import cache
+from django.db import connections, transaction
+from products.models import Product
+
+# Related products are drawn from a per-category pool of top-level products,
+# best rated first, stored in the cache. The pool holds the whole category up
+# to POOL_SIZE products, so rotating through it shows every product in all
+# but the largest categories (those only show their POOL_SIZE best rated).
+# Showing a product only needs the cached pool and one in_bulk() fetch for
+# the handful of products displayed, whatever the size of the category. Pools are recomputed on a background
+# thread after catalog and rating writes (see products.signals) and computed inline on a
+# cache miss, which is a LIMITed scan of the (category, average_rating) index.
+POOL_SIZE = 500
+POOL_TIMEOUT = 60 * 60 * 6
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='related-products')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _key(category_id):
+    return f"related_pool:{category_id}"
+
+
+def compute_pool(category_id):
+    # One extra so the pool still has POOL_SIZE entries after excluding the viewed product.
+    pool = list(
+        Product.objects.filter(category_id=category_id, parent=None)
+        .order_by('-average_rating', '-review_count')
+        .values_list('uid', flat=True)[:POOL_SIZE + 1]
+    )
+    cache.set(_key(category_id), pool, POOL_TIMEOUT)
+    return pool
+
+
+def get_pool(category_id):
+    pool = cache.get(_key(category_id))
+    if pool is None:
+        pool = compute_pool(category_id)
+    return pool
+
+
+def _refresh(category_id):
+    with _pending_lock:
+        _pending.discard(category_id)
+    try:
+        compute_pool(category_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_refresh(category_id):
+    """Recompute a category's pool in the background once the current transaction commits."""
+    def submit():
+        with _pending_lock:
+            if category_id in _pending:
+                return
+            _pending.add(category_id)
+        _executor.submit(_refresh, category_id)
+
+    transaction.on_commit(submit)
+
+
+def _refresh_for_products(product_ids):
+    try:
+        category_ids = set(
+            Product.objects.filter(uid__in=product_ids).values_list('category_id', flat=True))
+    finally:
+        connections.close_all()
+    for category_id in category_ids:
+        _refresh(category_id)
+
+
+def schedule_refresh_for_products(product_ids):
+    """Recompute the pools of the products' categories in the background once
+    the current transaction commits, e.g. after their ratings changed."""
+    product_ids = list(product_ids)
+    transaction.on_commit(lambda: _executor.submit(_refresh_for_products, product_ids))
+
+
+def related_products(product, count=4, rotate=True):
+    """Return up to ``count`` related products, rotating through the pool."""
+    pool = [uid for uid in get_pool(product.category_id) if uid != product.uid]
+    if len(pool) > count:
+        start = random.randrange(len(pool)) if rotate else 0
+        pool = (pool[start:] + pool[:start])[:count]
+
+    products = Product.objects.in_bulk(pool)
+    return [products[uid] for uid in pool if uid in products]
@@ -0,0 +1,137 @@
+import re
+import uuid
+from django.db import connection, transaction
+from django.db.models import Q
+from products.models import Product
+
+# SQLite FTS5 index over the searchable text of every product, kept in sync by
+# products.signals; ``rebuild_search_index`` repopulates it from scratch in
+# one transaction, so searches keep reading the old index until the new one
+# commits (writers queue for the lock meanwhile, as for any write). The
+# rowid is derived from the product uid so single-product updates are rowid
+# lookups rather than scans of the UNINDEXED uid column.
+SEARCH_TABLE = 'products_product_search'
+
+# bm25() weights, in column order: uid, name, description, category, sizes, colors.
+BM25_WEIGHTS = (0.0, 10.0, 1.0, 5.0, 2.0, 2.0)
+
+CREATE_SEARCH_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        uid UNINDEXED, product_name, description, category, sizes, colors,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+"""
+DROP_SEARCH_TABLE = f"DROP TABLE IF EXISTS {SEARCH_TABLE}"
+
+ROWID_MASK = (1 << 63) - 1
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(text):
+    # Quote every term so user input can never be parsed as FTS5 syntax, and
+    # prefix-match the last one so partial words still hit while typing.
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    quoted = ['"%s"' % term for term in terms]
+    quoted[-1] += '*'
+    return ' AND '.join(quoted)
+
+
+def _rowid(product_uid):
+    return product_uid.int & ROWID_MASK
+
+
+def _document(product):
+    return (
+        _rowid(product.uid),
+        product.uid.hex,
+        product.product_name,
+        product.product_desription,
+        product.category.category_name if product.category_id else '',
+        ' '.join(size.size_name for size in product.size_variant.all()),
+        ' '.join(color.color_name for color in product.color_variant.all()),
+    )
+
+
+def index_products(products):
+    """(Re)index every product in ``products`` (a Product queryset)."""
+    if not is_enabled():
+        return 0
+    products = products.select_related('category').prefetch_related('size_variant', 'color_variant')
+    documents = [_document(product) for product in products]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(document[0],) for document in documents])
+        cursor.executemany(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, uid, product_name, description, category, sizes, colors) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            documents,
+        )
+    return len(documents)
+
+
+def remove_product(product_uid):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [_rowid(product_uid)])
+
+
+def rebuild_index(chunk_size=1000):
+    if not is_enabled():
+        return 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_SEARCH_TABLE)
+            cursor.execute(CREATE_SEARCH_TABLE)
+
+        indexed = 0
+        last_uid = None
+        while True:
+            products = Product.objects.order_by('uid')
+            if last_uid is not None:
+                products = products.filter(uid__gt=last_uid)
+            uids = list(products.values_list('uid', flat=True)[:chunk_size])
+            if not uids:
+                break
+            indexed += index_products(Product.objects.filter(uid__in=uids))
+            last_uid = uids[-1]
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def search_products(text, limit=100):
+    """Return up to ``limit`` products matching ``text``, best match first."""
+    if not text.strip():
+        return []
+
+    if not is_enabled():
+        return list(Product.objects.filter(
+            Q(product_name__icontains=text) |
+            Q(category__category_name__icontains=text) |
+            Q(size_variant__size_name__icontains=text) |
+            Q(color_variant__color_name__icontains=text)
+        ).distinct()[:limit])
+
+    match = build_match_query(text)
+    if match is None:
+        return []
+
+    weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT uid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        ranked = [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+    products = Product.objects.in_bulk(ranked)
+    return [products[uid] for uid in ranked if uid in products]
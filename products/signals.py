@@ -0,0 +1,212 @@
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from products import search, suggest, related, fragments, coupons
+from products.reference import reference_data
+from products.facets import CATALOG_VERSION
+from base.cache import bump_version
+from products.models import (
+    Product, Category, SizeVariant, ColorVariant, ProductImage, ProductReview, Coupon,
+    sync_primary_image, apply_review_delta, recompute_ratings)
+
+
+# ------------------------
+#  PRIMARY IMAGE SYNC
+# ------------------------
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def update_primary_image(sender, instance, **kwargs):
+    sync_primary_image(instance.product_id)
+
+
+# ------------------------
+#  RATING AGGREGATES
+# ------------------------
+def ratings_changed(product_ids):
+    # Ratings are written with UPDATEs that send no Product signals, but
+    # rating-filtered facet counts and listings, and the related product
+    # pools (ordered by rating), depend on them.
+    bump_version(CATALOG_VERSION)
+    related.schedule_refresh_for_products(product_ids)
+
+
+@receiver(post_save, sender=ProductReview)
+def add_review_to_rating(sender, instance, created, **kwargs):
+    stars = int(instance.stars)
+    old_product_id, old_stars = getattr(instance, '_loaded_rating', (None, None))
+
+    if created:
+        apply_review_delta(instance.product_id, 1, stars)
+    elif old_product_id is None:
+        # Saved without being loaded first, so its previous contribution is unknown.
+        recompute_ratings([instance.product_id])
+    elif old_product_id != instance.product_id:
+        apply_review_delta(old_product_id, -1, -int(old_stars))
+        apply_review_delta(instance.product_id, 1, stars)
+    elif int(old_stars) != stars:
+        apply_review_delta(instance.product_id, 0, stars - int(old_stars))
+    else:
+        old_stars = stars
+
+    if old_stars != stars or old_product_id != instance.product_id:
+        ratings_changed({old_product_id, instance.product_id} - {None})
+    instance._loaded_rating = (instance.product_id, stars)
+
+
+@receiver(post_delete, sender=ProductReview)
+def remove_review_from_rating(sender, instance, **kwargs):
+    old_product_id, old_stars = getattr(
+        instance, '_loaded_rating', (instance.product_id, instance.stars))
+    apply_review_delta(old_product_id, -1, -int(old_stars))
+    ratings_changed({old_product_id})
+
+
+# ------------------------
+#  FULL-TEXT SEARCH INDEX
+# ------------------------
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, **kwargs):
+    search.index_products(Product.objects.filter(uid=instance.uid))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.remove_product(instance.uid)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.index_products(instance.products.all())
+
+
+@receiver(post_save, sender=SizeVariant)
+@receiver(post_save, sender=ColorVariant)
+def reindex_variant_products(sender, instance, created, **kwargs):
+    if not created:
+        search.index_products(instance.product_set.all())
+
+
+@receiver(pre_delete, sender=SizeVariant)
+@receiver(pre_delete, sender=ColorVariant)
+def remember_variant_products(sender, instance, **kwargs):
+    instance._indexed_product_ids = list(instance.product_set.values_list('uid', flat=True))
+
+
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def reindex_variant_products_after_delete(sender, instance, **kwargs):
+    search.index_products(Product.objects.filter(uid__in=getattr(instance, '_indexed_product_ids', [])))
+
+
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def reindex_product_variants(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._indexed_product_ids = list(instance.product_set.values_list('uid', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        product_ids = [instance.uid]
+    elif action == 'post_clear':
+        product_ids = getattr(instance, '_indexed_product_ids', [])
+    else:
+        product_ids = pk_set
+    search.index_products(Product.objects.filter(uid__in=product_ids))
+
+
+# ------------------------
+#  TYPEAHEAD PREFIX INDEX
+# ------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SizeVariant)
+@receiver(post_save, sender=ColorVariant)
+def update_suggestions(sender, instance, **kwargs):
+    suggest.index.upsert(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def remove_suggestions(sender, instance, **kwargs):
+    suggest.index.remove(instance)
+
+
+# ------------------------
+#  REFERENCE DATA REGISTRY
+# ------------------------
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SizeVariant)
+@receiver(post_save, sender=ColorVariant)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SizeVariant)
+@receiver(post_delete, sender=ColorVariant)
+def invalidate_reference_data(sender, **kwargs):
+    reference_data.invalidate()
+    bump_version(CATALOG_VERSION)
+
+
+# ------------------------
+#  CATALOG VERSION (facet and listing caches)
+# ------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_catalog_version(sender, **kwargs):
+    bump_version(CATALOG_VERSION)
+
+
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def bump_catalog_version_on_variants(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(CATALOG_VERSION)
+
+
+# ------------------------
+#  RELATED PRODUCT POOLS
+# ------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_related_pool(sender, instance, **kwargs):
+    related.schedule_refresh(instance.category_id)
+    old_category_id = getattr(instance, '_loaded_category_id', None)
+    if old_category_id is not None and old_category_id != instance.category_id:
+        related.schedule_refresh(old_category_id)
+    instance._loaded_category_id = instance.category_id
+
+
+# ------------------------
+#  PRODUCT PAGE FRAGMENT VERSION
+# ------------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_page(sender, instance, **kwargs):
+    fragments.bump_page_version(instance.uid)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def bump_product_page_for_child(sender, instance, **kwargs):
+    fragments.bump_page_version(instance.product_id)
+
+
+@receiver(m2m_changed, sender=Product.size_variant.through)
+@receiver(m2m_changed, sender=Product.color_variant.through)
+def bump_product_page_for_variants(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for product_id in (pk_set or []) if reverse else [instance.uid]:
+        fragments.bump_page_version(product_id)
+
+
+# ------------------------
+#  ACTIVE COUPON TABLE
+# ------------------------
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupons(sender, **kwargs):
+    coupons.invalidate()
@@ -0,0 +1,199 @@
+import re
+import time
+import logging
+import threading
+from bisect import bisect_left, insort
+from django.db import connection
+from django.urls import reverse
+from django.utils.http import urlencode
+from products.models import Product, Category, SizeVariant, ColorVariant
+
+# In-process prefix index for the navbar typeahead. Every name is indexed
+# under its full lowercased form and under each later word, so "max" finds
+# "Air Max 90". Lookups are a bisect into a sorted key list and never touch
+# the database; products.signals keeps the index current for writes made in
+# this process and MAX_AGE bounds how stale another worker's writes can leave it.
+# Each worker starts building the index in the background as soon as it takes
+# its first request (see ProductsConfig.ready); a typeahead request that
+# arrives before the build is done waits for it instead of starting its own.
+# After that a stale index keeps serving while a background thread rebuilds
+# it and swaps the new one in.
+logger = logging.getLogger(__name__)
+
+MAX_AGE = 600
+SCAN_LIMIT = 200
+
+KINDS = {
+    Product: 'product',
+    Category: 'category',
+    SizeVariant: 'size',
+    ColorVariant: 'color',
+}
+
+
+def _normalize(text):
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+def _describe(instance):
+    if isinstance(instance, Product):
+        return instance.product_name, reverse('get_product', args=[instance.slug])
+    if isinstance(instance, Category):
+        return instance.category_name, reverse('index') + '?' + urlencode({'category': instance.slug})
+    name = instance.size_name if isinstance(instance, SizeVariant) else instance.color_name
+    return name, reverse('product_search') + '?' + urlencode({'q': name})
+
+
+class PrefixIndex:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for the whole first build, so it only ever runs once.
+        self._build_lock = threading.Lock()
+        self._warming = False
+        self._keys = []
+        self._entries = {}
+        self._built_at = None
+        # Changes made while a background rebuild runs, replayed after the swap.
+        self._replay = None
+
+    def _terms(self, label):
+        words = _normalize(label).split()
+        # Rank 0 for the whole name, 1 for a match starting mid-name.
+        return [(' '.join(words[position:]), 0 if position == 0 else 1) for position in range(len(words))]
+
+    def _insert(self, key, label, url):
+        terms = [(term, rank, key) for term, rank in self._terms(label)]
+        for term in terms:
+            insort(self._keys, term)
+        self._entries[key] = (label, url, terms)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for term in entry[2]:
+            position = bisect_left(self._keys, term)
+            if position < len(self._keys) and self._keys[position] == term:
+                del self._keys[position]
+
+    def build(self):
+        entries = []
+        for model, kind in KINDS.items():
+            for instance in model.objects.all():
+                entries.append(((kind, str(instance.pk)),) + _describe(instance))
+
+        keys = {}
+        sorted_keys = []
+        for key, label, url in entries:
+            terms = [(term, rank, key) for term, rank in self._terms(label)]
+            keys[key] = (label, url, terms)
+            sorted_keys.extend(terms)
+        sorted_keys.sort()
+
+        with self._lock:
+            self._keys = sorted_keys
+            self._entries = keys
+            self._built_at = time.monotonic()
+            replay, self._replay = self._replay or [], None
+            for change in replay:
+                self._apply(*change)
+
+    def _rebuild_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Could not rebuild the suggestion index.")
+            with self._lock:
+                # Keep the old index and try again after another MAX_AGE.
+                self._built_at = time.monotonic()
+                self._replay = None
+        finally:
+            connection.close()
+
+    def _build_once(self):
+        with self._build_lock:
+            if self._built_at is not None:
+                return
+            with self._lock:
+                self._replay = []
+            try:
+                self.build()
+            except Exception:
+                with self._lock:
+                    self._replay = None
+                raise
+
+    def _warm(self):
+        try:
+            self._build_once()
+        except Exception:
+            logger.exception("Could not build the suggestion index.")
+        finally:
+            connection.close()
+
+    def warm(self, **kwargs):
+        """Build the index on a background thread unless that has already
+        started; a request_started receiver."""
+        if self._built_at is not None or self._warming:
+            return
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._warm, name="suggest-warm", daemon=True).start()
+
+    def _ensure_built(self):
+        if self._built_at is None:
+            self._build_once()
+            return
+        if time.monotonic() - self._built_at <= MAX_AGE:
+            return
+        with self._lock:
+            if self._replay is not None:
+                return
+            self._replay = []
+        threading.Thread(target=self._rebuild_in_background, name="suggest-rebuild", daemon=True).start()
+
+    def _apply(self, key, entry):
+        self._discard(key)
+        if entry is not None:
+            self._insert(key, *entry)
+
+    def _change(self, key, entry):
+        with self._lock:
+            if self._built_at is None and self._replay is None:
+                # Nothing built or building; the first build reads the change.
+                return
+            self._apply(key, entry)
+            if self._replay is not None:
+                self._replay.append((key, entry))
+
+    def upsert(self, instance):
+        self._change((KINDS[type(instance)], str(instance.pk)), _describe(instance))
+
+    def remove(self, instance):
+        self._change((KINDS[type(instance)], str(instance.pk)), None)
+
+    def suggest(self, text, limit=8):
+        prefix = _normalize(text)
+        if not prefix:
+            return []
+        self._ensure_built()
+
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            matches = {}
+            for term, rank, key in self._keys[position:position + SCAN_LIMIT]:
+                if not term.startswith(prefix):
+                    break
+                if key not in matches or rank < matches[key]:
+                    matches[key] = rank
+            ranked = sorted(matches.items(), key=lambda item: (item[1], self._entries[item[0]][0].lower()))
+            return [
+                {'label': self._entries[key][0], 'type': key[0], 'url': self._entries[key][1]}
+                for key, _ in ranked[:limit]
+            ]
+
+
+index = PrefixIndex()
@@ -1,3 +1,149 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from products.admin import ProductStockForm
+from products.models import (
+    Category, Product, ProductReview, ProductStock, SizeVariant, recompute_ratings)
 
-# Create your tests here.
+# Keeps the version counters and cached tables of one run out of the next.
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_product(name="Runner", price=100, category=None):
+    category = category or Category.objects.get_or_create(category_name="Sneakers")[0]
+    return Product.objects.create(
+        product_name=name, category=category, price=price, product_desription="A shoe.")
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ProductStockFormTests(TransactionTestCase):
+    def setUp(self):
+        self.size = SizeVariant.objects.create(size_name="8")
+        self.stock = ProductStock.objects.create(product=make_product(), size_variant=self.size, stock=10)
+
+    def form(self, instance, **data):
+        return ProductStockForm(data={'size_variant': self.size.pk, **data}, instance=instance)
+
+    def units(self):
+        self.stock.refresh_from_db()
+        return self.stock.stock
+
+    def test_stock_is_read_only_for_existing_rows(self):
+        form = self.form(self.stock, stock=999)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        self.assertEqual(self.units(), 10)
+        self.assertFalse(form.adjustment_failed)
+
+    def test_adjustment_is_applied_as_a_delta(self):
+        loaded = ProductStock.objects.get(uid=self.stock.uid)
+        # Three units sold after the form was loaded.
+        ProductStock.objects.filter(uid=self.stock.uid).update(stock=7)
+
+        form = self.form(loaded, adjust_by=5)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        self.assertEqual(self.units(), 12)
+
+    def test_adjustment_below_zero_is_rejected(self):
+        form = self.form(self.stock, adjust_by=-11)
+        self.assertFalse(form.is_valid())
+        self.assertIn('adjust_by', form.errors)
+
+    def test_adjustment_is_refused_when_sales_left_too_few_units(self):
+        loaded = ProductStock.objects.get(uid=self.stock.uid)
+        form = self.form(loaded, adjust_by=-8)
+        self.assertTrue(form.is_valid(), form.errors)
+        ProductStock.objects.filter(uid=self.stock.uid).update(stock=5)
+
+        form.save()
+
+        self.assertTrue(form.adjustment_failed)
+        self.assertEqual(self.units(), 5)
+
+    def test_new_rows_take_their_stock_as_entered(self):
+        form = ProductStockForm(data={'size_variant': SizeVariant.objects.create(size_name="9").pk,
+                                      'stock': 4, 'adjust_by': 100})
+        form.instance.product = self.stock.product
+        self.assertTrue(form.is_valid(), form.errors)
+
+        self.assertEqual(form.save().stock, 4)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.shoe, self.boot = make_product("Runner"), make_product("Boot")
+        self.users = [User.objects.create_user(username=f"reviewer{number}") for number in range(3)]
+
+    def review(self, stars, user=0, product=None):
+        return ProductReview.objects.create(
+            product=product or self.shoe, user=self.users[user], stars=stars)
+
+    def aggregates(self, product):
+        return Product.objects.filter(uid=product.uid).values_list(
+            'review_count', 'star_sum', 'average_rating').get()
+
+    def assertAggregates(self, product, expected):
+        self.assertEqual(self.aggregates(product), expected)
+        recompute_ratings([product.uid])
+        self.assertEqual(self.aggregates(product), expected)
+
+    def test_create(self):
+        self.review(5)
+        self.review(2, user=1)
+        self.assertAggregates(self.shoe, (2, 7, 3.5))
+
+    def test_edit_stars(self):
+        self.review(5)
+        review = ProductReview.objects.get(uid=self.review(2, user=1).uid)
+        review.stars = 4
+        review.save()
+        self.assertAggregates(self.shoe, (2, 9, 4.5))
+
+    def test_move_to_another_product(self):
+        self.review(5)
+        review = ProductReview.objects.get(uid=self.review(1, user=1).uid)
+        review.product = self.boot
+        review.stars = 3
+        review.save()
+        self.assertAggregates(self.shoe, (1, 5, 5.0))
+        self.assertAggregates(self.boot, (1, 3, 3.0))
+
+    def test_edit_right_after_create(self):
+        review = self.review(5)
+        review.stars = 1
+        review.save()
+        review.stars = 2
+        review.save()
+        self.assertAggregates(self.shoe, (1, 2, 2.0))
+
+    def test_delete(self):
+        self.review(5)
+        ProductReview.objects.get(uid=self.review(2, user=1).uid).delete()
+        self.assertAggregates(self.shoe, (1, 5, 5.0))
+
+    def test_deleting_the_last_review_leaves_a_zero_average(self):
+        review = self.review(4)
+        review.delete()
+        self.assertAggregates(self.shoe, (0, 0, 0.0))
+
+    def test_like_dislike_unlike(self):
+        review = self.review(4)
+        first, second = self.users[1], self.users[2]
+
+        self.assertEqual(review.toggle_vote(first), (1, 0))
+        self.assertEqual(review.toggle_vote(second), (2, 0))
+        self.assertEqual(review.toggle_vote(first, like=False), (1, 1))
+        self.assertEqual(review.toggle_vote(first, like=False), (1, 0))
+        self.assertEqual(review.toggle_vote(second), (0, 0))
+
+        self.assertEqual(review.likes.count(), 0)
+        self.assertEqual(review.dislikes.count(), 0)
+
+    def test_counters_match_the_vote_sets(self):
+        review = self.review(4)
+        for user, like in ((1, True), (2, False), (0, True), (2, True), (1, False)):
+            likes, dislikes = review.toggle_vote(self.users[user], like=like)
+            self.assertEqual((likes, dislikes), (review.likes.count(), review.dislikes.count()))
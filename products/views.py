@@ -1,19 +1,34 @@
-import random
 from .forms import ReviewForm
 from django.urls import reverse
+from django.db import transaction
 from django.contrib import messages
-from accounts.models import Cart, CartItem
+from accounts import inventory
+from accounts.models import Cart, add_cart_item
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from products.models import Product, SizeVariant, ProductReview, Wishlist
+from products.models import Product, ProductReview, Wishlist
+from products.reference import reference_data, get_size_or_404
+from products import related, fragments
+from django.utils.functional import SimpleLazyObject
 
 # Create your views here.
 
 def get_product(request, slug):
     product = get_object_or_404(Product, slug=slug)
-    sorted_size_variants = product.size_variant.all().order_by('size_name')
-    related_products = list(product.category.products.filter(parent=None).exclude(uid=product.uid))
+
+    # Shared page parts are lazy: they only hit the database when the
+    # matching template fragment is missing from the cache.
+    def size_variants():
+        size_ids = set(Product.size_variant.through.objects.filter(
+            product_id=product.uid).values_list('sizevariant_id', flat=True))
+        return sorted(reference_data.sizes_for(size_ids), key=lambda size: size.size_name)
+
+    def color_variants():
+        color_ids = set(Product.color_variant.through.objects.filter(
+            product_id=product.uid).values_list('colorvariant_id', flat=True))
+        return reference_data.colors_for(color_ids)
 
     # Review product view
     review = None
@@ -24,9 +39,7 @@ def get_product(request, slug):
             print("No reviews found for this product", str(e))
             messages.warning(request, "No reviews found for this product")
 
-    rating_percentage = 0
-    if product.reviews.exists():
-        rating_percentage = (product.get_rating() / 5) * 100
+    rating_percentage = product.get_rating_percentage()
 
     if request.method == 'POST' and request.user.is_authenticated:
         if review:
@@ -47,31 +60,37 @@ def get_product(request, slug):
         review_form = ReviewForm()
 
     # Related product view
-    if len(related_products) >= 4:
-        related_products = random.sample(related_products, 4)
+    related_products = SimpleLazyObject(lambda: related.related_products(product, count=4))
+    sorted_size_variants = SimpleLazyObject(size_variants)
 
     in_wishlist = False
     if request.user.is_authenticated:
         in_wishlist = Wishlist.objects.filter(user=request.user, product=product).exists()
 
-    reviews = product.reviews.order_by('-date_added')
+    reviews = product.reviews.select_related('user').order_by('-date_added')
 
     context = {
     'product': product,
     'sorted_size_variants': sorted_size_variants,
+    'color_variants': SimpleLazyObject(color_variants),
     'related_products': related_products,
     'review_form': review_form,
     'rating_percentage': rating_percentage,
     'in_wishlist': in_wishlist,
     'reviews': reviews,   # 👈 Required for template
+    'page_version': fragments.page_version(product.uid),
+    'fragment_timeout': fragments.FRAGMENT_TIMEOUT,
    }
 
 
+    # Only one of the product's own sizes is taken from the query string, so
+    # the page never echoes arbitrary input.
     if request.GET.get('size'):
-        size = request.GET.get('size')
-        price = product.get_product_price_by_size(size)
-        context['selected_size'] = size
-        context['updated_price'] = price
+        size = next((size for size in sorted_size_variants
+                     if size.size_name == request.GET['size']), None)
+        if size:
+            context['selected_size'] = size.size_name
+            context['updated_price'] = product.price + size.price
 
     return render(request, 'product/product.html', context=context)
 
@@ -103,26 +122,22 @@ def edit_review(request, review_uid):
     return JsonResponse({"detail": "Invalid request"}, status=400)
 
 # Like and Dislike review view
+@require_POST
+@login_required
 def like_review(request, review_uid):
-    review = ProductReview.objects.filter(uid=review_uid).first()
-
-    if request.user in review.likes.all():
-        review.likes.remove(request.user)
-    else:
-        review.likes.add(request.user)
-        review.dislikes.remove(request.user)
-    return JsonResponse({'likes': review.like_count(), 'dislikes': review.dislike_count()})
+    review = get_object_or_404(ProductReview, uid=review_uid)
+    likes, dislikes = review.toggle_vote(request.user, like=True)
+    fragments.bump_page_version(review.product_id)
+    return JsonResponse({'likes': likes, 'dislikes': dislikes})
 
 
+@require_POST
+@login_required
 def dislike_review(request, review_uid):
-    review = ProductReview.objects.filter(uid=review_uid).first()
-
-    if request.user in review.dislikes.all():
-        review.dislikes.remove(request.user)
-    else:
-        review.dislikes.add(request.user)
-        review.likes.remove(request.user)
-    return JsonResponse({'likes': review.like_count(), 'dislikes': review.dislike_count()})
+    review = get_object_or_404(ProductReview, uid=review_uid)
+    likes, dislikes = review.toggle_vote(request.user, like=False)
+    fragments.bump_page_version(review.product_id)
+    return JsonResponse({'likes': likes, 'dislikes': dislikes})
 
 
 # delete review view
@@ -151,7 +166,7 @@ def add_to_wishlist(request, uid):
         return redirect(request.META.get('HTTP_REFERER'))
 
     product = get_object_or_404(Product, uid=uid)
-    size_variant = get_object_or_404(SizeVariant, size_name=variant)
+    size_variant = get_size_or_404(variant)
     wishlist, created = Wishlist.objects.get_or_create(
         user=request.user, product=product, size_variant=size_variant)
 
@@ -168,7 +183,7 @@ def remove_from_wishlist(request, uid):
     size_variant_name = request.GET.get('size')
 
     if size_variant_name:
-        size_variant = get_object_or_404(SizeVariant, size_name=size_variant_name)
+        size_variant = get_size_or_404(size_variant_name)
         Wishlist.objects.filter(
             user=request.user, product=product, size_variant=size_variant).delete()
     else:
@@ -181,7 +196,8 @@ def remove_from_wishlist(request, uid):
 # Wishlist View
 @login_required
 def wishlist_view(request):
-    wishlist_items = Wishlist.objects.filter(user=request.user)
+    wishlist_items = Wishlist.objects.filter(
+        user=request.user).select_related('product', 'size_variant')
     return render(request, 'product/wishlist.html', {'wishlist_items': wishlist_items})
 
 
@@ -195,15 +211,16 @@ def move_to_cart(request, uid):
         return redirect('wishlist')
 
     size_variant = wishlist.size_variant
-    wishlist.delete()
-
     cart, created = Cart.objects.get_or_create(user=request.user, is_paid=False)
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, product=product, size_variant=size_variant)
 
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
+    try:
+        with transaction.atomic():
+            inventory.reserve(cart, product, size_variant)
+            add_cart_item(cart, product, size_variant)
+            wishlist.delete()
+    except inventory.OutOfStock as e:
+        messages.error(request, str(e))
+        return redirect('wishlist')
 
     messages.success(request, "Product moved to cart successfully!")
     return redirect('cart')